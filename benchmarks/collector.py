@@ -0,0 +1,248 @@
+"""TelemetryCollector hot path benchmarks.
+
+Feed synthetic packet streams through the TelemetryCollector and report the
+latency percentiles of the packet decoding, of every handler and of the
+Session and push hot paths, together with the overall packet throughput and
+the memory allocated per packet. Run with
+
+    python -m benchmarks.collector --save baseline.json
+
+and compare against a saved baseline with
+
+    python -m benchmarks.collector --baseline baseline.json
+"""
+
+import io
+import json
+import sys
+import tracemalloc
+import typing as t
+from argparse import ArgumentParser
+from collections import defaultdict
+from contextlib import redirect_stdout
+from functools import wraps
+from time import perf_counter
+from time import perf_counter_ns
+
+from benchmarks.synthetic import SESSIONS
+from benchmarks.synthetic import SyntheticSession
+from f1_telemetry.collector import TelemetryCollector
+from f1_telemetry.storage import Sink
+
+
+PERCENTILES = (50, 90, 99)
+
+
+class NullSink(Sink):
+    def __init__(self):
+        self.count = 0
+
+    def write(self, label, fields, timestamp=None):
+        self.count += 1
+
+
+class ReplayedDatagrams:
+    def __init__(self, datagrams):
+        self._datagrams = datagrams
+
+    def datagrams(self):
+        return iter(self._datagrams)
+
+
+class BenchCollector(TelemetryCollector):
+    def engineer(self, message, *args, **kwargs):
+        # Keep text-to-speech out of the measurements
+        pass
+
+
+def _timed(timings: t.List[int], f: t.Callable) -> t.Callable:
+    @wraps(f)
+    def _(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            timings.append(perf_counter_ns() - start)
+
+    return _
+
+
+def _timed_decode(timings, decode: t.Callable) -> t.Callable:
+    @wraps(decode)
+    def _(data):
+        start = perf_counter_ns()
+        packet = decode(data)
+        end = perf_counter_ns()
+        name = "skipped" if packet is None else type(packet).__name__[6:]
+        timings[f"decode[{name}]"].append(end - start)
+        return packet
+
+    return _
+
+
+def instrument(collector: TelemetryCollector, timings) -> None:
+    collector.packet_filter.decode = _timed_decode(
+        timings, collector.packet_filter.decode
+    )
+
+    for name in dir(collector):
+        if name.startswith("handle_") and name != "handle_generic":
+            setattr(collector, name, _timed(timings[name], getattr(collector, name)))
+
+    collector.push = _timed(timings["push"], collector.push)
+    collector.session.step = _timed(timings["Session.step"], collector.session.step)
+
+
+def percentile(values: t.List[int], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run_latency(datagrams) -> t.Dict[str, t.Dict[str, float]]:
+    timings = defaultdict(list)
+    collector = BenchCollector(ReplayedDatagrams(datagrams), NullSink())
+    instrument(collector, timings)
+    collector.collect()
+    collector.flush()
+
+    return {
+        name: {
+            "calls": len(values),
+            **{f"p{p}": percentile(values, p) / 1e3 for p in PERCENTILES},
+            "max": max(values) / 1e3,
+        }
+        for name, values in sorted(timings.items())
+        if values
+    }
+
+
+def run_throughput(datagrams, repeat: int = 3) -> float:
+    best = 0.0
+    for _ in range(repeat):
+        collector = BenchCollector(ReplayedDatagrams(datagrams), NullSink())
+        start = perf_counter()
+        collector.collect()
+        collector.flush()
+        best = max(best, len(datagrams) / (perf_counter() - start))
+    return best
+
+
+def run_allocations(datagrams) -> float:
+    collector = BenchCollector(None, NullSink())
+
+    total = 0
+    tracemalloc.start()
+    try:
+        for data in datagrams:
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            collector.listener = ReplayedDatagrams((data,))
+            collector.collect()
+            total += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+
+    return total / len(datagrams)
+
+
+def bench(kind: str, laps: int, flashbacks: bool) -> t.Dict[str, t.Any]:
+    session = SyntheticSession(kind, laps, flashback_every=40.0 if flashbacks else None)
+    datagrams = list(session.datagrams())
+
+    # Silence the session printer
+    with redirect_stdout(io.StringIO()):
+        return {
+            "packets": len(datagrams),
+            "packets_per_sec": run_throughput(datagrams),
+            "alloc_bytes_per_packet": run_allocations(datagrams),
+            "latency_us": run_latency(datagrams),
+        }
+
+
+def _change(value: float, baseline: t.Optional[float]) -> str:
+    if not baseline:
+        return ""
+    return f"{100.0 * (value - baseline) / baseline:+7.1f}%"
+
+
+def report(kind: str, result, baseline=None) -> None:
+    baseline = baseline or {}
+    print(f"\n== {kind} ({result['packets']} packets) ==")
+    print(
+        f"throughput   {result['packets_per_sec']:12.0f} packets/s "
+        f"{_change(result['packets_per_sec'], baseline.get('packets_per_sec'))}"
+    )
+    print(
+        f"allocations  {result['alloc_bytes_per_packet']:12.0f} bytes/packet "
+        f"{_change(result['alloc_bytes_per_packet'], baseline.get('alloc_bytes_per_packet'))}"
+    )
+    print()
+    print(f"{'':32}{'calls':>8}" + "".join(f"{f'p{p} [us]':>11}" for p in PERCENTILES))
+    for name, stats in result["latency_us"].items():
+        reference = baseline.get("latency_us", {}).get(name, {})
+        print(
+            f"{name:32}{stats['calls']:8}"
+            + "".join(f"{stats[f'p{p}']:11.1f}" for p in PERCENTILES)
+            + f"  {_change(stats['p50'], reference.get('p50'))}"
+        )
+
+
+def main(argv=None):
+    argp = ArgumentParser(prog="python -m benchmarks.collector")
+    argp.add_argument(
+        "-s",
+        "--session",
+        help="Session types to benchmark",
+        choices=list(SESSIONS),
+        nargs="+",
+        default=list(SESSIONS),
+    )
+    argp.add_argument("-l", "--laps", help="Laps per session", type=int, default=1)
+    argp.add_argument(
+        "--no-flashbacks",
+        help="Do not perform flashbacks during the sessions",
+        action="store_true",
+    )
+    argp.add_argument("--save", help="Save the results to the given file", type=str)
+    argp.add_argument(
+        "--baseline", help="Compare the results with the given baseline", type=str
+    )
+    argp.add_argument(
+        "--threshold",
+        help="Fail if the throughput drops by more than this fraction of the baseline",
+        type=float,
+        default=0.1,
+    )
+
+    args = argp.parse_args(argv)
+
+    baseline = {}
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for kind in args.session:
+        results[kind] = bench(kind, args.laps, not args.no_flashbacks)
+        report(kind, results[kind], baseline.get(kind))
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    regressions = [
+        kind
+        for kind, result in results.items()
+        if kind in baseline
+        and result["packets_per_sec"]
+        < (1 - args.threshold) * baseline[kind]["packets_per_sec"]
+    ]
+    if regressions:
+        print("\nThroughput regression in:", ", ".join(regressions))
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
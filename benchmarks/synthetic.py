@@ -0,0 +1,401 @@
+"""Synthetic F1 telemetry packet streams.
+
+The generator simulates a grid of cars lapping a fictional track and emits the
+raw datagrams that the game would send, at the game's packet rates, for Time
+Trial, qualifying and race sessions. Flashbacks rewind the simulation and emit
+the corresponding FLBK event, just like the game does.
+"""
+
+import copy
+import math
+import typing as t
+
+from f1.packets import PacketCarDamageData
+from f1.packets import PacketCarSetupData
+from f1.packets import PacketCarStatusData
+from f1.packets import PacketCarTelemetryData
+from f1.packets import PacketEventData
+from f1.packets import PacketFinalClassificationData
+from f1.packets import PacketLapData
+from f1.packets import PacketLapPositionsData
+from f1.packets import PacketMotionData
+from f1.packets import PacketMotionExData
+from f1.packets import PacketParticipantsData
+from f1.packets import PacketSessionData
+from f1.packets import PacketSessionHistoryData
+from f1.packets import PacketTimeTrialData
+from f1.packets import PacketTyreSetsData
+from f1.packets import SessionType
+
+
+PACKET_FORMAT = 2025
+PACKET_VERSION = 1
+
+PACKET_IDS = {
+    PacketMotionData: 0,
+    PacketSessionData: 1,
+    PacketLapData: 2,
+    PacketEventData: 3,
+    PacketParticipantsData: 4,
+    PacketCarSetupData: 5,
+    PacketCarTelemetryData: 6,
+    PacketCarStatusData: 7,
+    PacketFinalClassificationData: 8,
+    PacketCarDamageData: 10,
+    PacketSessionHistoryData: 11,
+    PacketTyreSetsData: 12,
+    PacketMotionExData: 13,
+    PacketTimeTrialData: 14,
+    PacketLapPositionsData: 15,
+}
+
+FRAME_RATE = 60
+TRACK_ID = 11  # Monza
+TRACK_LENGTH = 5793.0  # meters
+CORNERS = 7
+TOP_SPEED = 92.0  # m/s
+
+SESSIONS = {
+    "tt": (SessionType.TT, 2),
+    "qualifying": (SessionType.Q, 20),
+    "race": (SessionType.RACE, 20),
+}
+
+
+class Car:
+    def __init__(self, index: int, pace: float, offset: float) -> None:
+        self.index = index
+        self.pace = pace
+        self.lap = 1
+        self.lap_distance = offset
+        self.total_distance = offset
+        self.lap_time = 0.0
+        self.sectors = [0.0, 0.0]
+        self.last_lap_time = 0.0
+        self.best_lap_time = 0.0
+        self.speed = 0.0
+        self.acceleration = 0.0
+        self.tyre_wear = 0.0
+        self.fuel = 3.0
+
+    @property
+    def sector(self) -> int:
+        return min(int(3 * self.lap_distance / TRACK_LENGTH), 2)
+
+    def step(self, dt: float) -> None:
+        # Speed profile with a slow corner every TRACK_LENGTH / CORNERS meters
+        phase = math.pi * CORNERS * self.lap_distance / TRACK_LENGTH
+        speed = self.pace * TOP_SPEED * (0.35 + 0.65 * math.cos(phase) ** 2)
+        self.acceleration = (speed - self.speed) / dt if self.speed else 0.0
+        self.speed = speed
+
+        sector = self.sector
+        self.lap_distance += speed * dt
+        self.total_distance += speed * dt
+        self.lap_time += dt
+        if self.sector != sector and sector < 2:
+            self.sectors[sector] = self.lap_time - sum(self.sectors[:sector])
+
+        if self.lap_distance >= TRACK_LENGTH:
+            self.lap_distance -= TRACK_LENGTH
+            self.last_lap_time = self.lap_time
+            if not self.best_lap_time or self.lap_time < self.best_lap_time:
+                self.best_lap_time = self.lap_time
+            self.lap_time = 0.0
+            self.sectors = [0.0, 0.0]
+            self.lap += 1
+            self.tyre_wear += 2.5
+            self.fuel -= 1.0
+
+
+def _ms(seconds: float) -> int:
+    return int(seconds * 1000)
+
+
+class SyntheticSession:
+    """Generate the datagrams of a synthetic session.
+
+    The session runs for the given number of laps of the player car. A
+    flashback is performed every ``flashback_every`` seconds of session time,
+    rewinding the simulation by ``flashback_by`` seconds.
+    """
+
+    def __init__(
+        self,
+        kind: str = "tt",
+        laps: int = 1,
+        flashback_every: t.Optional[float] = 40.0,
+        flashback_by: float = 5.0,
+        session_uid: int = 0xF1,
+    ) -> None:
+        self.type, ncars = SESSIONS[kind]
+        self.laps = laps
+        self.flashback_every = flashback_every
+        self.flashback_by = flashback_by
+        self.session_uid = session_uid
+
+        self.cars = [
+            Car(i, 1.0 - 0.004 * i, -12.0 * i if self.is_race else 0.0)
+            for i in range(ncars)
+        ]
+        self.rival_index = 1 if self.type == SessionType.TT else 255
+
+        self.frame = 0
+        self.overall_frame = 0
+        self.time = 0.0
+
+    @property
+    def is_race(self) -> bool:
+        return self.type == SessionType.RACE
+
+    @property
+    def player(self) -> Car:
+        return self.cars[0]
+
+    def _header(self, packet):
+        header = packet.header
+        header.packet_format = PACKET_FORMAT
+        header.game_year = PACKET_FORMAT % 100
+        header.packet_version = PACKET_VERSION
+        header.packet_id = PACKET_IDS[type(packet)]
+        header.session_uid = self.session_uid
+        header.session_time = self.time
+        header.frame_identifier = self.frame
+        header.overall_frame_identifier = self.overall_frame
+        header.player_car_index = 0
+        header.secondary_player_car_index = 255
+        return packet
+
+    # ---- Packets ----
+
+    def motion(self) -> PacketMotionData:
+        packet = self._header(PacketMotionData())
+        radius = TRACK_LENGTH / (2 * math.pi)
+        for car, data in zip(self.cars, packet.car_motion_data):
+            theta = 2 * math.pi * car.lap_distance / TRACK_LENGTH
+            data.world_position_x = radius * math.cos(theta)
+            data.world_position_z = radius * math.sin(theta)
+            data.world_velocity_x = -car.speed * math.sin(theta)
+            data.world_velocity_z = car.speed * math.cos(theta)
+            data.g_force_lateral = car.speed**2 / radius / 9.81
+            data.g_force_longitudinal = car.acceleration / 9.81
+            data.g_force_vertical = 1.0
+            data.yaw = theta
+        return packet
+
+    def motion_ex(self) -> PacketMotionExData:
+        packet = self._header(PacketMotionExData())
+        for i in range(4):
+            packet.wheel_speed[i] = self.player.speed
+        return packet
+
+    def session(self) -> PacketSessionData:
+        packet = self._header(PacketSessionData())
+        packet.weather = 1
+        packet.track_temperature = 32
+        packet.air_temperature = 24
+        packet.total_laps = self.laps
+        packet.track_length = int(TRACK_LENGTH)
+        packet.session_type = self.type
+        packet.track_id = TRACK_ID
+        packet.num_weather_forecast_samples = 4
+        for i, sample in enumerate(packet.weather_forecast_samples[:4]):
+            sample.session_type = self.type
+            sample.time_offset = 5 * i
+            sample.weather = 1 + (i > 2)
+            sample.rain_percentage = 5 * i
+        return packet
+
+    def lap_data(self) -> PacketLapData:
+        packet = self._header(PacketLapData())
+        positions = sorted(self.cars, key=lambda c: -c.total_distance)
+        for position, car in enumerate(positions, 1):
+            data = packet.lap_data[car.index]
+            data.last_lap_time_in_ms = _ms(car.last_lap_time)
+            data.current_lap_time_in_ms = _ms(car.lap_time)
+            for n, sector_time in enumerate(car.sectors, 1):
+                ms = _ms(sector_time)
+                setattr(data, f"sector{n}_time_ms_part", ms % 60000)
+                setattr(data, f"sector{n}_time_minutes_part", ms // 60000)
+            data.lap_distance = car.lap_distance
+            data.total_distance = car.total_distance
+            data.car_position = position
+            data.current_lap_num = car.lap
+            data.sector = car.sector
+            data.grid_position = car.index + 1
+            data.driver_status = 4 if self.is_race else 1
+            data.result_status = 2
+        packet.time_trial_pb_car_idx = 255
+        packet.time_trial_rival_car_idx = self.rival_index
+        return packet
+
+    def telemetry(self) -> PacketCarTelemetryData:
+        packet = self._header(PacketCarTelemetryData())
+        for car, data in zip(self.cars, packet.car_telemetry_data):
+            speed = car.speed * 3.6
+            data.speed = int(speed)
+            data.throttle = 1.0 if car.acceleration >= 0 else 0.0
+            data.brake = (
+                min(-car.acceleration / 40.0, 1.0) if car.acceleration < 0 else 0
+            )
+            data.steer = math.sin(
+                2 * math.pi * CORNERS * car.lap_distance / TRACK_LENGTH
+            )
+            data.gear = min(8, 1 + int(speed / 40))
+            data.engine_rpm = 6000 + int(speed * 20) % 6000
+            data.drs = 0
+            data.rev_lights_percent = data.engine_rpm // 130
+            for i in range(4):
+                data.brakes_temperature[i] = 400 + int(300 * data.brake)
+                data.tyres_surface_temperature[i] = 95 + i
+                data.tyres_inner_temperature[i] = 100 + i
+                data.tyres_pressure[i] = 23.5
+            data.engine_temperature = 110
+        packet.suggested_gear = 0
+        return packet
+
+    def car_status(self) -> PacketCarStatusData:
+        packet = self._header(PacketCarStatusData())
+        for car, data in zip(self.cars, packet.car_status_data):
+            data.fuel_in_tank = 10.0 * car.fuel
+            data.fuel_capacity = 110.0
+            data.fuel_remaining_laps = car.fuel
+            data.max_rpm = 13000
+            data.max_gears = 8
+            data.actual_tyre_compound = 16
+            data.visual_tyre_compound = 16
+            data.tyres_age_laps = car.lap - 1
+            data.ers_store_energy = 4e6
+        return packet
+
+    def car_damage(self) -> PacketCarDamageData:
+        packet = self._header(PacketCarDamageData())
+        for car, data in zip(self.cars, packet.car_damage_data):
+            for i in range(4):
+                data.tyres_wear[i] = car.tyre_wear + 0.1 * i
+                data.tyres_damage[i] = int(car.tyre_wear)
+        return packet
+
+    def participants(self) -> PacketParticipantsData:
+        packet = self._header(PacketParticipantsData())
+        packet.num_active_cars = len(self.cars)
+        for car, data in zip(self.cars, packet.participants):
+            data.ai_controlled = int(car.index != 0)
+            data.driver_id = car.index
+            data.race_number = car.index + 1
+            data.name = f"Driver {car.index}".encode()
+        return packet
+
+    def car_setups(self) -> PacketCarSetupData:
+        packet = self._header(PacketCarSetupData())
+        for data in packet.car_setup_data[: len(self.cars)]:
+            data.front_wing = data.rear_wing = 20
+            data.fuel_load = 30.0
+        return packet
+
+    def session_history(self) -> PacketSessionHistoryData:
+        packet = self._header(PacketSessionHistoryData())
+        car = self.cars[self.overall_frame % len(self.cars)]
+        packet.car_idx = car.index
+        packet.num_laps = car.lap
+        return packet
+
+    def tyre_sets(self) -> PacketTyreSetsData:
+        packet = self._header(PacketTyreSetsData())
+        packet.car_idx = self.overall_frame % len(self.cars)
+        return packet
+
+    def time_trial(self) -> PacketTimeTrialData:
+        packet = self._header(PacketTimeTrialData())
+        packet.player_session_best_data_set.lap_time_in_ms = _ms(
+            self.player.best_lap_time
+        )
+        packet.rival_data_set.car_idx = self.rival_index
+        return packet
+
+    def lap_positions(self) -> PacketLapPositionsData:
+        packet = self._header(PacketLapPositionsData())
+        packet.num_laps = self.player.lap
+        return packet
+
+    def flashback(self, session_time: float) -> PacketEventData:
+        packet = self._header(PacketEventData())
+        packet.event_string_code[:] = list(b"FLBK")
+        packet.event_details.flashback.flashback_frame_identifier = self.frame
+        packet.event_details.flashback.flashback_session_time = session_time
+        return packet
+
+    def final_classification(self) -> PacketFinalClassificationData:
+        packet = self._header(PacketFinalClassificationData())
+        packet.num_cars = len(self.cars)
+        positions = sorted(self.cars, key=lambda c: -c.total_distance)
+        for position, car in enumerate(positions, 1):
+            data = packet.classification_data[car.index]
+            data.position = position
+            data.num_laps = car.lap - 1
+            data.result_status = 3
+            data.best_lap_time_in_ms = _ms(car.best_lap_time)
+            data.total_race_time = car.total_distance / TOP_SPEED
+        return packet
+
+    # ---- Stream ----
+
+    def frame_packets(self) -> t.Iterator:
+        every = lambda hz: self.overall_frame % (FRAME_RATE // hz) == 0  # noqa
+
+        yield self.motion()
+        yield self.motion_ex()
+        if every(2):
+            yield self.session()
+        yield self.lap_data()
+        yield self.telemetry()
+        yield self.car_status()
+        if every(10):
+            yield self.car_damage()
+        if every(20):
+            yield self.session_history()
+            yield self.tyre_sets()
+        if every(2):
+            yield self.car_setups()
+        if self.overall_frame % (5 * FRAME_RATE) == 0:
+            yield self.participants()
+        if every(1):
+            yield self.lap_positions()
+            if self.type == SessionType.TT:
+                yield self.time_trial()
+
+    def packets(self) -> t.Iterator:
+        dt = 1.0 / FRAME_RATE
+        snapshots = []
+        next_flashback = self.flashback_every
+
+        while self.player.lap <= self.laps:
+            if self.overall_frame % FRAME_RATE == 0:
+                snapshots.append((self.time, self.frame, copy.deepcopy(self.cars)))
+
+            yield from self.frame_packets()
+
+            for car in self.cars:
+                car.step(dt)
+            self.time += dt
+            self.frame += 1
+            self.overall_frame += 1
+
+            if next_flashback is not None and self.time >= next_flashback:
+                next_flashback += self.flashback_every
+                target = self.time - self.flashback_by
+                while len(snapshots) > 1 and snapshots[-1][0] > target:
+                    snapshots.pop()
+                yield self.flashback(snapshots[-1][0])
+                self.time, self.frame, cars = snapshots[-1]
+                self.cars = copy.deepcopy(cars)
+
+        # Let the collector see the last lap completed
+        yield from self.frame_packets()
+
+        if self.type != SessionType.TT:
+            yield self.final_classification()
+
+    def datagrams(self) -> t.Iterator[bytes]:
+        for packet in self.packets():
+            yield bytes(packet)
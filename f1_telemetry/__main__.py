@@ -1,19 +1,418 @@
+import os
+import sqlite3
+import sys
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
 
-from f1.listener import PacketListener
+import numpy as np
 
 from f1_telemetry import live
+from f1_telemetry.capture import CaptureError
+from f1_telemetry.capture import CaptureWriter
+from f1_telemetry.capture import ReplayListener
+from f1_telemetry.catalog import WET
+from f1_telemetry.catalog import Catalog
 from f1_telemetry.collector import TelemetryCollector
+from f1_telemetry.compare import CHANNELS
+from f1_telemetry.compare import expand
+from f1_telemetry.compare import overlay
+from f1_telemetry.decimate import DEFAULT_TOLERANCES
+from f1_telemetry.decimate import DecimatingSink
+from f1_telemetry.delta import load_reference
+from f1_telemetry.grid import GridRecorder
+from f1_telemetry.listener import TelemetryListener
+from f1_telemetry.listener import listen
+from f1_telemetry.migrate import convert
+from f1_telemetry.migrate import delete
+from f1_telemetry.migrate import legacy_measurements
+from f1_telemetry.report import fmtt
 from f1_telemetry.server import serve
 from f1_telemetry.storage import InfluxDBSink
 from f1_telemetry.storage import InfluxDBSinkError
+from f1_telemetry.store import ColumnarStore
 
 
 DEFAULT_BUCKET = "f1-telemetry"
 
 
+def _sink(args):
+    if args.store is not None:
+        sink = ColumnarStore(args.store)
+    else:
+        sink = InfluxDBSink(
+            org=args.org, token=args.token, bucket=args.bucket, spool=args.spool
+        )
+
+    if args.decimate:
+        try:
+            tolerances = [
+                (pattern, float(tolerance))
+                for pattern, _, tolerance in (_.rpartition("=") for _ in args.tolerance)
+            ]
+        except ValueError:
+            raise SystemExit("Tolerances must be given as <field>=<value>") from None
+        sink = DecimatingSink(sink, tolerances + DEFAULT_TOLERANCES)
+
+    return sink
+
+
+def _fallback(args):
+    if args.spool is not None:
+        return f"Telemetry data will be spooled to {args.spool} until it is."
+    return "Telemetry data will not be stored until it is."
+
+
+def _reference(argp, args):
+    if args.reference is None:
+        return None
+
+    try:
+        return load_reference(args.reference)
+    except (OSError, ValueError) as e:
+        argp.error(f"Cannot load the reference lap: {e}")
+
+
+def _catalog(argp, args):
+    if args.catalog is None:
+        return None
+
+    try:
+        return Catalog(args.catalog)
+    except sqlite3.Error as e:
+        argp.error(f"Cannot open the catalog: {e}")
+
+
+def replay(argv):
+    argp = ArgumentParser(prog="f1-tel replay")
+
+    argp.add_argument(
+        "file",
+        help="Capture file created with the --record option",
+        type=str,
+    )
+    argp.add_argument(
+        "-s",
+        "--speed",
+        help="Replay speed factor, e.g. 1 for real time. Use 0 to replay as fast as possible",
+        type=float,
+        default=0,
+    )
+    argp.add_argument(
+        "-o",
+        "--org",
+        help="InfluxDB Org",
+        type=str,
+    )
+    argp.add_argument(
+        "-t",
+        "--token",
+        help="InfluxDB Token",
+        type=str,
+    )
+    argp.add_argument(
+        "-b",
+        "--bucket",
+        help="InfluxDB Bucket",
+        type=str,
+        default=DEFAULT_BUCKET,
+    )
+    argp.add_argument(
+        "-r",
+        "--report",
+        help="Generate reports at the end of sessions",
+        action="store_true",
+    )
+    argp.add_argument(
+        "--store",
+        help="Store the telemetry data in local column files in the given directory instead of InfluxDB",
+        type=str,
+    )
+    argp.add_argument(
+        "--spool",
+        help="Spool the telemetry data to the given file while InfluxDB is not available",
+        type=str,
+    )
+    argp.add_argument(
+        "--grid",
+        help="Record the motion, lap and telemetry data of all the cars in the given directory",
+        type=str,
+    )
+    argp.add_argument(
+        "--reference",
+        help="Lap directory of a local store to compute the live delta against, until a faster lap is set",
+        type=str,
+    )
+    argp.add_argument(
+        "--catalog",
+        help="Index the stored sessions and laps in the given SQLite database",
+        type=str,
+    )
+    encoding = argp.add_mutually_exclusive_group()
+    encoding.add_argument(
+        "--decimate",
+        help="Only store the records that cannot be interpolated within the field tolerances",
+        action="store_true",
+    )
+    encoding.add_argument(
+        "--changes-only",
+        help="Only store the fields that change, with full records at lap and sector boundaries",
+        action="store_true",
+    )
+    argp.add_argument(
+        "--tolerance",
+        help="Decimation tolerance of the fields matching a pattern, e.g. speed=0.5 or 'g_force_*=0.1'",
+        type=str,
+        action="append",
+        default=[],
+    )
+
+    args = argp.parse_args(argv)
+
+    if args.store is None and (args.org is None or args.token is None):
+        argp.error("either --store or both --org and --token are required")
+
+    with _sink(args) as sink:
+        if not sink.connected:
+            print(f"WARNING: InfluxDB not available. {_fallback(args)}")
+
+        listener = ReplayListener(args.file, args.speed)
+        grid = GridRecorder(args.grid) if args.grid else None
+        catalog = _catalog(argp, args)
+        collector = TelemetryCollector(
+            listener,
+            sink,
+            args.report,
+            changes_only=args.changes_only,
+            grid=grid,
+            reference=_reference(argp, args),
+            catalog=catalog,
+        )
+
+        try:
+            collector.collect()
+        except CaptureError as e:
+            print("Error:", e)
+        except KeyboardInterrupt:
+            pass
+
+        collector.flush()
+        if grid is not None:
+            grid.close()
+        if catalog is not None:
+            catalog.close()
+
+    print(f"\nReplayed {listener.count} packets")
+    print(collector.packet_filter.summary())
+    if grid is not None:
+        print(grid.summary())
+
+
+def compare(argv):
+    argp = ArgumentParser(prog="f1-tel compare")
+
+    argp.add_argument(
+        "laps",
+        help="Lap directories of a local store. Session directories expand to all their laps",
+        type=str,
+        nargs="+",
+    )
+    argp.add_argument(
+        "-s",
+        "--step",
+        help="Lap distance grid step, in metres",
+        type=float,
+        default=1.0,
+    )
+    argp.add_argument(
+        "-o",
+        "--output",
+        help="Write the resampled laps to the given CSV file",
+        type=str,
+    )
+
+    args = argp.parse_args(argv)
+
+    try:
+        paths = expand(args.laps)
+        laps = overlay(paths, args.step)
+    except (OSError, ValueError) as e:
+        print("Error:", e)
+        return 1
+
+    print(f"{'Lap':40}{'Time [s]':>10}{'Top speed':>11}{'Delta [s]':>11}")
+    for path, lap in zip(paths, laps):
+        delta = lap["delta"][np.isfinite(lap["delta"])]
+        print(
+            f"{os.path.relpath(path):40}{np.nanmax(lap['time']):10.3f}"
+            f"{np.nanmax(lap['speed']):11.0f}{delta[-1] if len(delta) else np.nan:+11.3f}"
+        )
+
+    if args.output is not None:
+        names = ["distance"]
+        columns = [laps[0]["distance"]]
+        for i, lap in enumerate(laps):
+            for channel in ("time", "delta") + CHANNELS:
+                names.append(f"{i}_{channel}")
+                columns.append(lap[channel])
+        np.savetxt(
+            args.output,
+            np.column_stack(columns),
+            delimiter=",",
+            header=",".join(names),
+            comments="",
+            fmt="%.6g",
+        )
+
+
+def migrate(argv):
+    argp = ArgumentParser(prog="f1-tel migrate")
+
+    argp.add_argument(
+        "org",
+        help="InfluxDB Org",
+        type=str,
+    )
+    argp.add_argument(
+        "token",
+        help="InfluxDB Token",
+        type=str,
+    )
+    argp.add_argument(
+        "-b",
+        "--bucket",
+        help="InfluxDB Bucket",
+        type=str,
+        default=DEFAULT_BUCKET,
+    )
+    argp.add_argument(
+        "--batch-size",
+        help="Number of records to write at once",
+        type=int,
+        default=5000,
+    )
+    argp.add_argument(
+        "--delete",
+        help="Delete the old measurements once they have been migrated",
+        action="store_true",
+    )
+
+    args = argp.parse_args(argv)
+
+    # The writer thread is not started, as records are written synchronously
+    sink = InfluxDBSink(org=args.org, token=args.token, bucket=args.bucket)
+    if not sink.connected:
+        print("Error: InfluxDB not available")
+        return 1
+
+    try:
+        measurements = legacy_measurements(sink)
+        print(f"Migrating {len(measurements)} laps")
+        for measurement in measurements:
+            count = convert(sink, measurement, args.batch_size)
+            if count < 0:
+                print(f"[ERROR] Cannot migrate {measurement}. Stopping")
+                return 1
+
+            print(f"Migrated {count} records of {measurement}")
+            if args.delete:
+                delete(sink, measurement)
+    except Exception as e:
+        print("Error:", e)
+        return 1
+    finally:
+        sink.client.close()
+
+    print(sink.summary())
+
+
+def laps(argv):
+    argp = ArgumentParser(prog="f1-tel laps")
+
+    argp.add_argument(
+        "catalog",
+        help="Catalog created with the --catalog option",
+        type=str,
+    )
+    argp.add_argument(
+        "--track",
+        help="Only the laps on the given track, e.g. Monza",
+        type=str,
+    )
+    argp.add_argument(
+        "--type",
+        help="Only the laps of the given session type, e.g. TT or RACE",
+        type=str,
+    )
+    weather = argp.add_mutually_exclusive_group()
+    weather.add_argument(
+        "--weather",
+        help="Only the laps in the given weather, e.g. 'Light rain'. Can be given more than once",
+        type=str,
+        action="append",
+    )
+    weather.add_argument(
+        "--wet",
+        help="Only the laps in the rain",
+        action="store_true",
+    )
+    argp.add_argument(
+        "--tyre",
+        help="Only the laps on the given tyre, e.g. Soft or Inter",
+        type=str,
+    )
+    argp.add_argument(
+        "--valid",
+        help="Only the valid laps",
+        action="store_true",
+    )
+    argp.add_argument(
+        "-n",
+        "--limit",
+        help="Maximum number of laps to list",
+        type=int,
+        default=10,
+    )
+
+    args = argp.parse_args(argv)
+
+    if not os.path.isfile(args.catalog):
+        argp.error(f"No catalog at {args.catalog}")
+
+    try:
+        with Catalog(args.catalog) as catalog:
+            rows = catalog.laps(
+                track=args.track,
+                session_type=args.type,
+                weather=WET if args.wet else args.weather,
+                tyre=args.tyre,
+                valid=True if args.valid else None,
+                limit=args.limit,
+            )
+    except sqlite3.Error as e:
+        print("Error:", e)
+        return 1
+
+    print(
+        f"{'Time':>10}  {'Session':28}{'Type':>7}{'Lap':>5}"
+        f"{'S1':>9}{'S2':>9}{'S3':>9}  {'Tyre':8}{'Weather':12}{'Valid':5}  Location"
+    )
+    for row in rows:
+        sectors = "".join(
+            f"{_ / 1000 if _ else float('nan'):9.3f}"
+            for _ in (row["sector_1_ms"], row["sector_2_ms"], row["sector_3_ms"])
+        )
+        print(
+            f"{fmtt(row['time_ms']):>10}  {row['slug']:28}{row['type']:>7}"
+            f"{row['lap']:5}{sectors}  {row['tyre'] or '':8}{row['weather'] or '':12}"
+            f"{'yes' if row['valid'] else 'no':5}  {row['location'] or ''}"
+        )
+
+
 def main():
+    if sys.argv[1:2] and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
+
     argp = ArgumentParser(prog="f1-tel")
 
     argp.add_argument(
@@ -60,43 +459,172 @@ def main():
         help="Generate reports at the end of sessions. Useful for session coordinators",
         action="store_true",
     )
+    argp.add_argument(
+        "--live-rate",
+        help="Maximum rate of a live message type, e.g. trace=30. Use 0 to send on every change",
+        type=str,
+        action="append",
+        default=[],
+    )
+    argp.add_argument(
+        "--record",
+        help="Append the raw telemetry packets to the given capture file",
+        type=str,
+    )
+    argp.add_argument(
+        "--rcvbuf",
+        help="Size of the telemetry socket receive buffer, in bytes, e.g. 4194304",
+        type=int,
+    )
+    argp.add_argument(
+        "--asyncio",
+        help="Receive the telemetry packets in the event loop of the live data server",
+        action="store_true",
+    )
+    argp.add_argument(
+        "--store",
+        help="Store the telemetry data in local column files in the given directory instead of InfluxDB",
+        type=str,
+    )
+    argp.add_argument(
+        "--spool",
+        help="Spool the telemetry data to the given file while InfluxDB is not available",
+        type=str,
+    )
+    argp.add_argument(
+        "--grid",
+        help="Record the motion, lap and telemetry data of all the cars in the given directory",
+        type=str,
+    )
+    argp.add_argument(
+        "--reference",
+        help="Lap directory of a local store to compute the live delta against, until a faster lap is set",
+        type=str,
+    )
+    argp.add_argument(
+        "--catalog",
+        help="Index the stored sessions and laps in the given SQLite database",
+        type=str,
+    )
+    encoding = argp.add_mutually_exclusive_group()
+    encoding.add_argument(
+        "--decimate",
+        help="Only store the records that cannot be interpolated within the field tolerances",
+        action="store_true",
+    )
+    encoding.add_argument(
+        "--changes-only",
+        help="Only store the fields that change, with full records at lap and sector boundaries",
+        action="store_true",
+    )
+    argp.add_argument(
+        "--tolerance",
+        help="Decimation tolerance of the fields matching a pattern, e.g. speed=0.5 or 'g_force_*=0.1'",
+        type=str,
+        action="append",
+        default=[],
+    )
 
     args = argp.parse_args()
 
-    collector = None
+    try:
+        live_rates = {
+            _type: float(rate)
+            for _type, _, rate in (_.partition("=") for _ in args.live_rate)
+        }
+    except ValueError:
+        argp.error("Live rates must be given as <type>=<Hz>")
 
     try:
-        with InfluxDBSink(org=args.org, token=args.token, bucket=args.bucket) as sink:
+        with _sink(args) as sink:
             if not sink.connected:
-                print(
-                    "WARNING: InfluxDB not available. Telemetry data will not be stored."
-                )
+                print(f"WARNING: InfluxDB not available. {_fallback(args)}")
+            elif args.store is not None:
+                print(f"Storing telemetry data in {args.store}")
             else:
                 print("Connected to InfluxDB")
 
-            listener = PacketListener(host=args.address, port=args.port)
-            collector = TelemetryCollector(listener, sink, args.report)
+            capture = CaptureWriter(args.record) if args.record else None
+            listener = (
+                None
+                if args.asyncio
+                else TelemetryListener(args.address, args.port, capture, args.rcvbuf)
+            )
+            grid = GridRecorder(args.grid) if args.grid else None
+            catalog = _catalog(argp, args)
+            collector = TelemetryCollector(
+                listener,
+                sink,
+                args.report,
+                live_rates,
+                args.changes_only,
+                grid,
+                _reference(argp, args),
+                catalog,
+            )
+
+            try:
+                server_thread = Thread(
+                    target=serve, args=(args.org, args.token, args.host)
+                )
+                server_thread.daemon = True
+                server_thread.start()
+
+                print("Listening for telemetry data ...")
+                if args.asyncio:
+                    # Handle the packets in the event loop, and keep the
+                    # blocking work, like report generation, off it.
+                    collector.executor = ThreadPoolExecutor(max_workers=1)
+
+                    print("Starting live data websocket server")
+                    live.serve(
+                        host=args.host,
+                        setup=[
+                            listen(
+                                collector,
+                                args.address,
+                                args.port,
+                                capture,
+                                args.rcvbuf,
+                            )
+                        ],
+                    )
+                else:
+                    collector_thread = Thread(target=collector.collect)
+                    collector_thread.daemon = True
+                    collector_thread.start()
 
-            server_thread = Thread(target=serve, args=(args.org, args.token, args.host))
-            server_thread.daemon = True
-            server_thread.start()
+                    print("Starting live data websocket server")
+                    # FIXME: Mixing asyncio and threads is yuck!
+                    live.serve(host=args.host)
 
-            print("Listening for telemetry data ...")
-            collector_thread = Thread(target=collector.collect)
-            collector_thread.daemon = True
-            collector_thread.start()
+            except KeyboardInterrupt:
+                collector.flush()
+                if collector.executor is not None:
+                    collector.executor.shutdown()
+                if grid is not None:
+                    grid.close()
+                    print(f"\n{grid.summary()} to {args.grid}")
+                if catalog is not None:
+                    catalog.close()
+                if capture is not None:
+                    capture.close()
+                    print(f"\nRecorded {capture.count} packets to {args.record}")
+                print("\n" + collector.packet_filter.summary())
+                print("\nBOX BOX.")
 
-            print("Starting live data websocket server")
-            # FIXME: Mixing asyncio and threads is yuck!
-            live.serve(host=args.host)
+        print(sink.summary())
 
     except InfluxDBSinkError as e:
         print("Error:", e)
 
-    except KeyboardInterrupt:
-        if collector is not None:
-            collector.flush()
-        print("\nBOX BOX.")
+
+COMMANDS = {
+    "replay": replay,
+    "compare": compare,
+    "migrate": migrate,
+    "laps": laps,
+}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+import typing as t
+from array import array
+
+
+# The field that marks the full records when only changes are emitted
+KEYFRAME = "keyframe"
+
+_MISSING = object()
+
+
+class FlashbackWindow:
+    """Ring buffer of the records within the flashback window.
+
+    Records are kept as the changes pushed at each point in time, together
+    with the session time, lap and lap distance columns, in preallocated
+    slots. The full record is only assembled when it leaves the window and is
+    handed over to ``emit``, together with its session time and lap. The time
+    column is used to truncate the buffer in logarithmic time when a flashback
+    happens.
+
+    With ``changes_only``, records only carry the fields that have changed
+    since the previous record, except for keyframes, i.e. the first record of
+    every lap and the records pushed as keyframes, which carry every field.
+    The full records can be reconstructed with ``densify``.
+    """
+
+    def __init__(
+        self,
+        emit: t.Callable[[float, int, t.Dict[str, t.Any]], None],
+        window: float = 16.0,
+        capacity: int = 4096,
+        changes_only: bool = False,
+    ) -> None:
+        self.emit = emit
+        self.window = window
+        self.capacity = capacity
+        self.changes_only = changes_only
+
+        self.times = array("d", bytes(8 * capacity))
+        self.laps = array("l", bytes(array("l").itemsize * capacity))
+        self.distances = array("d", bytes(8 * capacity))
+        self.keyframes = bytearray(capacity)
+        self.changes: t.List[t.Optional[t.Dict[str, t.Any]]] = [None] * capacity
+
+        self.head = 0
+        self.size = 0
+
+        # The last emitted record, and the distance of the last record pushed
+        self.emitted: t.Dict[str, t.Any] = {}
+        self.emitted_lap: t.Optional[int] = None
+        self.distance = 0.0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def push(
+        self,
+        time: float,
+        lap: int,
+        distance: float,
+        fields: t.Dict[str, t.Any],
+        keyframe: bool = False,
+    ) -> None:
+        if self.size == self.capacity:
+            self._pop()
+
+        row = (self.head + self.size) % self.capacity
+        self.times[row] = time
+        self.laps[row] = lap
+        self.distances[row] = distance
+        self.keyframes[row] = keyframe
+        self.changes[row] = fields
+        self.size += 1
+
+        self.distance = distance
+
+        # Emit the records that have left the window
+        horizon = time - self.window
+        while self.size and self.times[self.head] < horizon:
+            self._pop()
+
+    def truncate(self, time: float) -> t.Optional[int]:
+        """Drop the records after the given time.
+
+        Returns the lap of the last record left in the window, if any.
+        """
+        capacity, head, times = self.capacity, self.head, self.times
+
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if times[(head + mid) % capacity] <= time:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        for i in range(lo, self.size):
+            self.changes[(head + i) % capacity] = None
+        self.size = lo
+
+        if not lo:
+            self.distance = 0.0
+            return None
+
+        self.distance = self.distances[(head + lo - 1) % capacity]
+        return self.laps[(head + lo - 1) % capacity]
+
+    def flush(self) -> None:
+        while self.size:
+            self._pop()
+
+    def clear(self) -> None:
+        for i in range(self.size):
+            self.changes[(self.head + i) % self.capacity] = None
+        self.head = self.size = 0
+        self.emitted_lap = None
+
+    def _pop(self) -> None:
+        row = self.head
+        changes = self.changes[row]
+        self.changes[row] = None
+        self.head = (row + 1) % self.capacity
+        self.size -= 1
+
+        lap = self.laps[row]
+        emitted = self.emitted
+        if not self.changes_only:
+            emitted.update(changes)
+            record = dict(emitted)
+        elif self.keyframes[row] or lap != self.emitted_lap:
+            emitted.update(changes)
+            record = dict(emitted)
+            record[KEYFRAME] = 1
+        else:
+            record = {
+                name: value
+                for name, value in changes.items()
+                if emitted.get(name, _MISSING) != value
+            }
+            emitted.update(record)
+        self.emitted_lap = lap
+
+        record["distance"] = self.distances[row]
+
+        self.emit(self.times[row], lap, record)
+
+
+def densify(
+    records: t.Iterable[t.Tuple[str, t.Dict[str, t.Any]]],
+) -> t.Iterator[t.Tuple[str, t.Dict[str, t.Any]]]:
+    """Reconstruct the full records from change-only ones.
+
+    The records are (label, fields) pairs, in the order they were emitted.
+    Every label, i.e. every lap, starts with a keyframe, so the records of a
+    lap can be reconstructed on their own.
+    """
+    label, state = None, {}
+    for _label, fields in records:
+        if _label != label or KEYFRAME in fields:
+            label, state = _label, {}
+        state.update(fields)
+        record = dict(state)
+        record.pop(KEYFRAME, None)
+        yield label, record
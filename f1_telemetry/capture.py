@@ -0,0 +1,121 @@
+import mmap
+import struct
+from time import monotonic
+from time import sleep
+from time import time
+
+from f1.packets import resolve
+
+
+# Capture file layout: MAGIC, followed by records made of a RECORD header
+# (receive timestamp, datagram size) and the raw datagram bytes.
+MAGIC = b"F1TELCAP\x01"
+RECORD = struct.Struct("<dH")
+
+
+class CaptureError(Exception):
+    pass
+
+
+class CaptureWriter:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, data: bytes, timestamp=None) -> None:
+        self._file.write(
+            RECORD.pack(time() if timestamp is None else timestamp, len(data))
+        )
+        self._file.write(data)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+class CaptureReader:
+    """Iterate over the (timestamp, datagram) records of a capture file.
+
+    The file is memory-mapped and the datagrams are returned as memoryview
+    slices of the mapping, so no per-packet reads or copies are made.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                return
+
+        with mm:
+            if mm[: len(MAGIC)] != MAGIC:
+                raise CaptureError(f"{self.path} is not a telemetry capture file")
+
+            view = memoryview(mm)
+            offset = len(MAGIC)
+            end = len(mm)
+            try:
+                while offset + RECORD.size <= end:
+                    timestamp, size = RECORD.unpack_from(mm, offset)
+                    offset += RECORD.size
+                    if offset + size > end:
+                        # Truncated record
+                        break
+                    with view[offset : offset + size] as data:
+                        yield timestamp, data
+                    offset += size
+            finally:
+                view.release()
+
+
+class ReplayListener:
+    """Replay the packets of a capture file.
+
+    With a speed of 1 packets are replayed in real time, with N at N times the
+    original speed, and with 0 as fast as possible.
+    """
+
+    def __init__(self, path, speed: float = 0):
+        self.reader = CaptureReader(path)
+        self.speed = speed
+        self.count = 0
+        self.skipped = 0
+
+    def datagrams(self):
+        start = None
+
+        for timestamp, data in self.reader:
+            if self.speed > 0:
+                if start is None:
+                    start = timestamp, monotonic()
+                else:
+                    delay = (timestamp - start[0]) / self.speed - (
+                        monotonic() - start[1]
+                    )
+                    if delay > 0:
+                        sleep(delay)
+
+            self.count += 1
+
+            yield data
+
+    def __iter__(self):
+        for data in self.datagrams():
+            try:
+                yield resolve(data)
+            except (KeyError, ValueError):
+                # Unknown packet format or malformed datagram
+                self.skipped += 1
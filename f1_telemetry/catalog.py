@@ -0,0 +1,150 @@
+import sqlite3
+import typing as t
+
+
+# The weather conditions that count as wet
+WET = ("Light rain", "Heavy rain", "Storm")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    uid TEXT PRIMARY KEY,
+    slug TEXT NOT NULL,
+    track TEXT NOT NULL,
+    type TEXT NOT NULL,
+    weather TEXT,
+    started INTEGER,
+    finished INTEGER NOT NULL DEFAULT 0,
+    position INTEGER,
+    laps INTEGER,
+    best_lap_time_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS sessions_by_track ON sessions (track COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS laps (
+    session TEXT NOT NULL REFERENCES sessions (uid),
+    lap INTEGER NOT NULL,
+    time_ms INTEGER NOT NULL,
+    sector_1_ms INTEGER,
+    sector_2_ms INTEGER,
+    sector_3_ms INTEGER,
+    valid INTEGER NOT NULL,
+    tyre TEXT,
+    weather TEXT,
+    location TEXT,
+    PRIMARY KEY (session, lap)
+);
+CREATE INDEX IF NOT EXISTS laps_by_time ON laps (time_ms);
+"""
+
+
+class Catalog:
+    """Index of the sessions and laps that have been stored.
+
+    The catalog is an SQLite database with a row for every session, with its
+    track, type, weather and final classification, and a row for every lap,
+    with its lap and sector times, validity, tyre, weather and the location of
+    its raw data. Rows are replaced when they are written again, e.g. when a
+    capture is replayed or a lap is completed again after a flashback.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _write(self, sql: str, params: t.Sequence[t.Any]) -> None:
+        try:
+            with self.db:
+                self.db.execute(sql, params)
+        except sqlite3.Error as e:
+            print(f"[ERROR] Cannot update the catalog: {e}")
+
+    def add_session(
+        self,
+        uid: int,
+        slug: str,
+        track: str,
+        session_type: str,
+        weather: t.Optional[str],
+        started: int,
+    ) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO sessions "
+            "(uid, slug, track, type, weather, started) VALUES (?, ?, ?, ?, ?, ?)",
+            (str(uid), slug, track, session_type, weather, started),
+        )
+
+    def add_lap(
+        self,
+        uid: int,
+        lap: int,
+        time_ms: int,
+        sectors: t.Sequence[int],
+        valid: bool,
+        tyre: t.Optional[str],
+        weather: t.Optional[str],
+        location: t.Optional[str],
+    ) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO laps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (str(uid), lap, time_ms, *sectors, valid, tyre, weather, location),
+        )
+
+    def finish(self, uid: int, position: int, laps: int, best_lap_time_ms: int) -> None:
+        self._write(
+            "UPDATE sessions SET finished = 1, position = ?, laps = ?, "
+            "best_lap_time_ms = ? WHERE uid = ?",
+            (position, laps, best_lap_time_ms, str(uid)),
+        )
+
+    def laps(
+        self,
+        track: t.Optional[str] = None,
+        session_type: t.Optional[str] = None,
+        weather: t.Optional[t.Sequence[str]] = None,
+        tyre: t.Optional[str] = None,
+        valid: t.Optional[bool] = None,
+        limit: t.Optional[int] = None,
+    ) -> t.List[sqlite3.Row]:
+        """The laps that match the given conditions, fastest first."""
+        conditions, params = [], []
+        if track is not None:
+            conditions.append("s.track = ? COLLATE NOCASE")
+            params.append(track)
+        if session_type is not None:
+            conditions.append("s.type = ? COLLATE NOCASE")
+            params.append(session_type)
+        if weather:
+            conditions.append(f"l.weather IN ({', '.join('?' * len(weather))})")
+            params.extend(weather)
+        if tyre is not None:
+            conditions.append("l.tyre = ? COLLATE NOCASE")
+            params.append(tyre)
+        if valid is not None:
+            conditions.append("l.valid = ?")
+            params.append(int(valid))
+
+        sql = (
+            "SELECT s.slug, s.track, s.type, l.* FROM laps l "
+            "JOIN sessions s ON s.uid = l.session"
+        )
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY l.time_ms"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return self.db.execute(sql, params).fetchall()
@@ -1,12 +1,12 @@
-import threading
 import typing as t
 from bisect import bisect_left
 from collections import defaultdict
-from collections import deque
+from time import monotonic
+from time import perf_counter_ns
 from time import time
 
-import pyttsx3
 from f1.handler import PacketHandler
+from f1.packets import HEADER_FIELD_TO_PACKET_TYPE
 from f1.packets import TYRES
 from f1.packets import Packet
 from f1.packets import PacketCarDamageData
@@ -18,16 +18,63 @@ from f1.packets import PacketParticipantsData
 from f1.packets import PacketSessionData
 from f1.packets import SessionType
 
+from f1_telemetry.buffer import FlashbackWindow
+from f1_telemetry.delta import LapDelta
+from f1_telemetry.engineer import INFO
+from f1_telemetry.engineer import URGENT
+from f1_telemetry.engineer import WARNING
+from f1_telemetry.engineer import RaceEngineer
+from f1_telemetry.extract import DAMAGE
+from f1_telemetry.extract import MOTION
+from f1_telemetry.extract import TELEMETRY
+from f1_telemetry.frame import FrameAssembler
+from f1_telemetry.intervals import IntervalTower
+from f1_telemetry.listener import PacketFilter
+from f1_telemetry.live import CONFLATED
+from f1_telemetry.live import clear_state
 from f1_telemetry.live import enqueue
+from f1_telemetry.live import has_subscribers
+from f1_telemetry.metrics import FLASHBACK_DEPTH
+from f1_telemetry.metrics import FLUSH_LATENCY
+from f1_telemetry.metrics import FRAMES
+from f1_telemetry.metrics import HANDLER_LATENCY
+from f1_telemetry.metrics import PACKET_LOSS
+from f1_telemetry.metrics import PACKETS_LOST
+from f1_telemetry.metrics import PACKETS_RECEIVED
+from f1_telemetry.metrics import PACKETS_REORDERED
+from f1_telemetry.metrics import PACKETS_SKIPPED
+from f1_telemetry.metrics import PUSH_LATENCY
+from f1_telemetry.metrics import SINK_DROPPED
+from f1_telemetry.metrics import SINK_QUEUE_DEPTH
+from f1_telemetry.metrics import SINK_WRITE_LATENCY
+from f1_telemetry.metrics import timed
 from f1_telemetry.model import Session
 from f1_telemetry.model import SessionEventHandler
 from f1_telemetry.report import HumanCounter
 from f1_telemetry.report import QualifyingReport
 from f1_telemetry.report import RaceDirector
 from f1_telemetry.report import RaceReport
+from f1_telemetry.summary import LapSummary
 from f1_telemetry.view import SessionPrinter
 
 
+# Maximum rate, in Hz, at which live messages are sent. Messages are only sent
+# when their data changes, and types with no rate are sent on every change.
+LIVE_RATES = {
+    "trace": 30.0,
+    "tyre_temp": 2.0,
+    "fuel": 1.0,
+    "car_status": 0,
+    "weather_data": 0,
+    "intervals": 2.0,
+    "delta": 10.0,
+}
+
+TYRES_INNER_TEMPERATURE = [
+    f"tyres_inner_temperature_{tyre.name.lower()}" for tyre in TYRES
+]
+
+
 def closest(values, value):
     pos = bisect_left(values, value)
     if pos == 0:
@@ -41,17 +88,25 @@ def closest(values, value):
     return pos - 1
 
 
-def _flatten_tyre_values(data, name):
-    temps = data.pop(name)
-    data.update(
-        {f"{name}_{tyre.name.lower()}": temp for tyre, temp in zip(TYRES, temps)}
-    )
+def _datagrams(listener):
+    # Listeners that only give the decoded packets, like the plain
+    # PacketListener, are turned back into datagrams, so that every packet goes
+    # through the packet filter.
+    for packet in listener:
+        yield bytes(packet)
 
 
 def _player_index(packet: Packet) -> int:
     return packet.header.player_car_index
 
 
+def _session_type(session_type) -> str:
+    try:
+        return SessionType(session_type).name
+    except ValueError:
+        return str(session_type)
+
+
 def player_name(player) -> str:
     name = player.name.decode()
     return f"{name}{player.network_id}" if name == "Player" else name
@@ -69,24 +124,54 @@ def _weather(packet: PacketSessionData) -> t.Tuple[str, str]:
 
 
 class TelemetryCollector(PacketHandler, SessionEventHandler):
-    def __init__(self, listener, sink, report=False):
+    def __init__(
+        self,
+        listener,
+        sink,
+        report=False,
+        live_rates=None,
+        changes_only=False,
+        grid=None,
+        reference=None,
+        catalog=None,
+    ):
         super().__init__(listener)
 
         self.sink = sink
-        self.queue = deque()  # To handle flashbacks
-        self.last_fields = {}
+        self.grid = grid  # To record the data of all the cars
+        self.catalog = catalog  # To index the stored sessions and laps
+        # To handle flashbacks
+        self.window = FlashbackWindow(self._write, changes_only=changes_only)
+        self.section = None  # The (lap, sector) of the last record pushed
+        self.summary = LapSummary(self.window.window)
 
         self.session = Session(self)
-        self.motion_data = None
+        # The player car data of a frame, with the rival motion in TT sessions
+        self.frames = FrameAssembler(
+            [
+                ("motion", MOTION.names()),
+                ("rival_motion", MOTION.names("rival_")),
+                ("lap", ("lap_time_ms",)),
+                ("telemetry", TELEMETRY.names()),
+            ],
+            required=("motion", "telemetry"),
+            final="telemetry",
+        )
         self.tyre_data_emitted = False
+        self.lap_invalid = False
 
         self.last_live_data = {}
+        self.live_rates = {**LIVE_RATES, **(live_rates or {})}
+        self.live_next = {}
         self.printer = SessionPrinter()
 
         self.gap = 0.0  # meters
         self.leader_distance = []
         self.leader_time = []
         self.leader_timestamp = []
+        self.intervals = IntervalTower()
+        # To the personal best lap
+        self.lap_delta = LapDelta(*reference) if reference else LapDelta()
         self.rival_index = 255
         self.distance = 0.0
         self.rival_distance = 0.0
@@ -103,65 +188,168 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
         self._last_forecast = None
 
         self.last_packets = {}
+        self.packet_filter = PacketFilter(self.consumed_packets())
+        self.executor = None  # For blocking work when running in the event loop
+        self._handlers = {}
 
         self.sc_slow_down_timestamp = 0
-
-        self.rival_motion_data = None
+        self.race_engineer = RaceEngineer()
 
         self.race_director = None
 
         self.last_fuel = None
 
+        # Expose the state of this collector in the metrics
+        FLASHBACK_DEPTH.callback = self.window.__len__
+        PACKETS_RECEIVED.callback = lambda: [
+            ((name,), count)
+            for name, count in (
+                self.packet_filter.decoded + self.packet_filter.skipped
+            ).items()
+        ]
+        PACKETS_SKIPPED.callback = lambda: [
+            ((name,), count) for name, count in self.packet_filter.skipped.items()
+        ]
+        loss = self.packet_filter.loss
+        PACKETS_LOST.callback = lambda: [
+            ((name,), stream.lost) for name, stream in loss.streams.items()
+        ]
+        PACKETS_REORDERED.callback = lambda: [
+            ((name,), stream.reordered) for name, stream in loss.streams.items()
+        ]
+        PACKET_LOSS.callback = lambda: [
+            ((name,), loss.loss_rate(name)) for name in loss.streams
+        ]
+        SINK_QUEUE_DEPTH.callback = lambda: getattr(self.sink, "queue_depth", 0)
+        SINK_DROPPED.callback = lambda: self.sink.dropped
+        FRAMES.callback = lambda: [
+            (("complete",), self.frames.frames),
+            (("incomplete",), self.frames.incomplete),
+            (("late",), self.frames.late),
+        ]
+
+    @timed(PUSH_LATENCY)
     def push(self, fields: t.Dict[str, t.Any]):
         current_time = self.session.time
         if (
             self.session is None
             or self.session.lap == 0
-            or self.distance < self.last_fields.get("distance", 0)
+            or self.distance < self.window.distance
             or current_time is None
         ):
             return
 
-        self.last_fields.update(fields)
-        self.last_fields["distance"] = self.distance
+        # Full records are written at lap and sector boundaries
+        section = (self.session.lap, self.session.sector)
+        keyframe = section != self.section
+        self.section = section
 
-        self.queue.append((current_time, self.session.lap, self.last_fields.copy()))
+        self.window.push(
+            current_time, self.session.lap, self.distance, fields, keyframe
+        )
+        self.summary.update(current_time, *section, fields, self.session.fuel)
+
+    @timed(SINK_WRITE_LATENCY)
+    def _write(self, time, lap, data):
+        self.offload(
+            self.sink.write,
+            f"{self.session.slug}|{lap:002}",
+            data,
+            self.session.timestamp(time),
+        )
 
-        # Flush data outside the flashback window
-        flashback_time = current_time - 16.0
-        while self.queue:
-            time, lap, data = self.queue[0]
-            if time >= flashback_time:
-                break
-            self.queue.popleft()
-            self.sink.write(f"{self.session.slug}|{lap:002}", data)
+    def _summarize(self, lap, fields):
+        # Every summary of the session has the same timestamp, so the ones of
+        # a lap rewritten after a flashback replace the previous ones.
+        self.offload(
+            self.sink.summarize,
+            f"{self.session.slug}|{lap:002}",
+            fields,
+            self.session.timestamp(0.0),
+        )
 
+    @timed(FLUSH_LATENCY)
     def flush(self):
-        while self.queue:
-            _, lap, data = self.queue.popleft()
-            self.sink.write(f"{self.session.slug}|{lap:002}", data)
+        self.window.flush()
+
+    def live_due(self, _type: str) -> bool:
+        # The state of the conflated types is kept even without clients
+        if _type not in CONFLATED and not has_subscribers():
+            return False
+        return monotonic() >= self.live_next.get(_type, 0)
 
     def push_live(self, _type: str, data: t.Dict[str, t.Any]):
-        if self.session is None:
+        if self.session is None or not self.live_due(_type):
             return
 
         if _type == "trace":
             data["distance"] = self.distance
-        
-        live_data = {"type": _type, "data": data}
-        if live_data == self.last_live_data.get(_type, None):
+
+        if data == self.last_live_data.get(_type, None):
             return
 
         if enqueue({"type": _type, "data": data}):
-            self.last_live_data[_type] = live_data
+            self.last_live_data[_type] = data
+            rate = self.live_rates.get(_type)
+            if rate:
+                self.live_next[_type] = monotonic() + 1.0 / rate
+
+    def consumed_packets(self):
+        return {
+            packet_type
+            for packet_type in HEADER_FIELD_TO_PACKET_TYPE.values()
+            if hasattr(self, f"handle_{packet_type.__name__[6:]}")
+        }
+
+    def handle_packet(self, packet):
+        self.handle_generic(packet)
+        # Records are stamped with the time of the packet they come from
+        self.session.time = packet.header.session_time
+
+        if self.grid is not None:
+            self.grid.put(packet)
+
+        packet_type = type(packet)
+        try:
+            handler, latency = self._handlers[packet_type]
+        except KeyError:
+            name = packet_type.__name__[6:]
+            handler, latency = self._handlers[packet_type] = (
+                getattr(self, f"handle_{name}", None),
+                HANDLER_LATENCY.labels(name),
+            )
+        if handler is not None:
+            start = perf_counter_ns()
+            handler(packet)
+            latency.observe((perf_counter_ns() - start) / 1e9)
 
     def collect(self):
-        return self.handle()
+        datagrams = getattr(self.listener, "datagrams", None)
+        for data in _datagrams(self.listener) if datagrams is None else datagrams():
+            self.handle_datagram(data)
+
+    def handle_datagram(self, data):
+        packet = self.packet_filter.decode(data)
+        if packet is not None:
+            self.handle_packet(packet)
+
+    def offload(self, f, *args):
+        # The executor has a single worker, so the calls run in order
+        if self.executor is None:
+            return f(*args)
+        return self.executor.submit(f, *args)
 
     # ---- SessionEventHandler ----
 
     def on_sector(self, n: int, lap: int, time: float, best: bool) -> None:
         self.push({f"sector_{n}_ms": time})
+
+        summary = self.summary.sector(lap, n)
+        if summary is not None:
+            if time > 0:
+                summary[f"s{n}_time_ms"] = time
+            self._summarize(lap, summary)
+
         if time <= 0:
             return
 
@@ -169,7 +357,12 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
         current_time = sum(self.session.sectors[1 : n + 1])
 
         self.printer.print_sector(
-            n, lap, time, best, best_time == 0 or current_time < best_time
+            n,
+            lap,
+            time,
+            best,
+            best_time == 0 or current_time < best_time,
+            self.lap_delta.delta if n < 3 else None,
         )
 
     def on_new_lap(self, current_lap, previous_lap, previous_sectors, best):
@@ -192,21 +385,51 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
                 self.stop_needed = laps_to_pit < remaining_laps
                 if 0 < laps_to_pit < min(5, remaining_laps):
                     self.engineer(
-                        f"Pit in {laps_to_pit} laps. {laps_to_pit} laps till pit"
-                        if laps_to_pit > 1
-                        else "BOX BOX BOX!"
+                        (
+                            f"Pit in {laps_to_pit} laps. {laps_to_pit} laps till pit"
+                            if laps_to_pit > 1
+                            else "BOX BOX BOX!"
+                        ),
+                        URGENT,
+                        key="pit",
                     )
                 elif current_max_wear > 25:
                     self.engineer(
-                        f"Tyre wear {round(current_max_wear)}. Degradation rate {round(rate_per_lap)}."
+                        f"Tyre wear {round(current_max_wear)}. Degradation rate {round(rate_per_lap)}.",
+                        key="tyre_wear",
                     )
                     if self.stop_needed:
-                        self.engineer("Pit required.")
+                        self.engineer("Pit required.", WARNING)
         self.max_tyre_wear = current_max_wear
 
+        summary = self.summary.lap(previous_lap)
+        if summary is not None:
+            if last_lap_time > 0:
+                summary["time_ms"] = last_lap_time
+            self._summarize(previous_lap, summary)
+
+        if self.catalog is not None and last_lap_time > 0:
+            self.offload(
+                self.catalog.add_lap,
+                self.session.session_uid,
+                previous_lap,
+                last_lap_time,
+                previous_sectors,
+                not self.lap_invalid,
+                self.session.tyre,
+                _weather(self.get_last(PacketSessionData))[1],
+                self.sink.location(f"{self.session.slug}|{previous_lap:002}"),
+            )
+
+        delta = self.lap_delta.finish(
+            last_lap_time / 1000.0, best and last_lap_time > 0
+        )
+
         if last_lap_time > 0:
             self.push({"total_time_ms": last_lap_time})
             self.printer.print_lap_time(previous_lap, last_lap_time, best)
+            if delta is not None:
+                self.printer.print_delta(delta)
             if self.tyre_data_emitted:
                 self.printer.print_tyre(
                     self.session.tyre, self.session.tyre_age, rate_per_lap
@@ -223,7 +446,7 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
         self.tyre_data_emitted = False
         self.leader_distance.clear()
         self.leader_time.clear()
-        self.last_fields.pop("distance", None)
+        self.window.distance = 0.0
 
     def on_finish(self, lap, sectors, best):
         try:
@@ -236,17 +459,41 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
         self.printer.print_session(session.slug)
         self.flush()
 
-        self.queue.clear()
+        self.offload(
+            self.sink.new_session,
+            session.slug,
+            {"track": session.track, "session_type": _session_type(session.type)},
+        )
+
+        self.window.clear()
 
-        self.motion_data = None
-        self.rival_motion_data = None
+        self.frames.clear()
         self.tyre_data_emitted = False
 
+        if self.grid is not None:
+            self.grid.open(session.slug)
+
+        if self.catalog is not None:
+            self.offload(
+                self.catalog.add_session,
+                session.session_uid,
+                session.slug,
+                session.track,
+                _session_type(session.type),
+                _weather(self.get_last(PacketSessionData))[1],
+                session.timestamp(0.0),
+            )
+
         self.last_live_data.clear()
+        self.live_next.clear()
+        clear_state()
 
         self.gap = 0.0  # meters
         self.leader_distance.clear()
         self.leader_time.clear()
+        self.intervals.clear()
+        self.lap_delta.clear(session.track)
+        self.summary.clear()
         self.rival_index = 255
         self.distance = 0.0
         self.rival_distance = 0.0
@@ -301,39 +548,37 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
             )
         ):
             self.engineer(
-                r"{} in {} minutes with {}% chance of rain".format(*next_forecast)
+                r"{} in {} minutes with {}% chance of rain".format(*next_forecast),
+                key="weather",
+                ttl=30.0,
             )
         self._last_forecast = next_forecast
 
-        self.push_live(
-            "weather_data",
-            {
-                "weather": _weather(packet),
-                "forecasts": [
-                    (sample.time_offset, *_weather(sample), sample.rain_percentage)
-                    for _, sample in zip(
-                        range(4),
-                        forecasts,
-                    )
-                ],
-                "nforecasts": [_weather(s)[0] for s in next_session_forecast],
-            },
-        )
+        if self.live_due("weather_data"):
+            self.push_live(
+                "weather_data",
+                {
+                    "weather": _weather(packet),
+                    "forecasts": [
+                        (sample.time_offset, *_weather(sample), sample.rain_percentage)
+                        for _, sample in zip(
+                            range(4),
+                            forecasts,
+                        )
+                    ],
+                    "nforecasts": [_weather(s)[0] for s in next_session_forecast],
+                },
+            )
 
     def handle_CarTelemetryData(self, packet: PacketCarTelemetryData):
-        if self.motion_data is None:
-            return
-
         try:
-            data = packet.car_telemetry_data[_player_index(packet)].to_dict()
+            values = TELEMETRY.values(packet, _player_index(packet))
         except IndexError:
             return
 
-        data.update(self.motion_data)
-        if self.rival_motion_data:
-            data.update(self.rival_motion_data)
-            self.rival_motion_data = None
-        self.motion_data = None
+        data = self.frames.put(packet.header, "telemetry", values)
+        if data is None:
+            return
 
         if self.session.type == SessionType.TT:
             data["gap"] = self.gap
@@ -348,11 +593,8 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
 
                 self.push_live("trace", data)
 
-        self.push_live("tyre_temp", data["tyres_inner_temperature"])
-
-        for k, v in dict(data).items():
-            if isinstance(v, list) and len(v) == len(TYRES):
-                _flatten_tyre_values(data, k)
+        if self.live_due("tyre_temp"):
+            self.push_live("tyre_temp", [data[_] for _ in TYRES_INNER_TEMPERATURE])
 
         self.max_speed = max(self.max_speed, data["speed"])
 
@@ -382,18 +624,16 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
 
     def handle_CarDamageData(self, packet):
         try:
-            data = packet.car_damage_data[_player_index(packet)].to_dict()
+            data = DAMAGE.extract(packet, _player_index(packet))
         except IndexError:
             return
 
-        for k, v in dict(data).items():
-            if isinstance(v, list) and len(v) == len(TYRES):
-                _flatten_tyre_values(data, k)
-
         # Keep track of wing damage
         wing_status = data["front_left_wing_damage"], data["front_right_wing_damage"]
         if wing_status != self.wing_status and any(wing_status):
-            self.engineer("Wing damage at {} {}".format(*wing_status))
+            self.engineer(
+                "Wing damage at {} {}".format(*wing_status), WARNING, key="wing"
+            )
         self.wing_status = wing_status
 
         self.push_live("car_status", data)
@@ -402,20 +642,42 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
 
     def handle_FinalClassificationData(self, packet: PacketFinalClassificationData):
         self.flush()
+        session_uid = self.session.session_uid
         self.session.final_classification()
 
+        if self.catalog is not None and session_uid is not None:
+            data = packet.classification_data[_player_index(packet)]
+            self.offload(
+                self.catalog.finish,
+                session_uid,
+                data.position,
+                data.num_laps,
+                data.best_lap_time_in_ms,
+            )
+
         if self.report:
+            # Reports might be generated on another thread, so they get a copy
+            # of the state they need.
+            drivers = dict(self.drivers)
+            classification = type(packet.classification_data).from_buffer_copy(
+                packet.classification_data
+            )
             if self.session.is_qualifying():
-                QualifyingReport(
-                    self.drivers, packet.classification_data, self.human_count
-                ).generate(f"{self.session.slug.replace('|', '_').replace(':', '')}-Q")
+                self.offload(
+                    QualifyingReport(
+                        drivers, classification, self.human_count
+                    ).generate,
+                    f"{self.session.slug.replace('|', '_').replace(':', '')}-Q",
+                )
             elif self.session.is_race():
-                RaceReport(
-                    self.drivers, packet.classification_data, self.human_count
-                ).generate(f"{self.session.slug.replace('|', '_').replace(':', '')}-R")
+                self.offload(
+                    RaceReport(drivers, classification, self.human_count).generate,
+                    f"{self.session.slug.replace('|', '_').replace(':', '')}-R",
+                )
                 if self.race_director is not None:
-                    self.race_director.generate(
-                        f"{self.session.slug.replace('|', '_').replace(':', '')}-D"
+                    self.offload(
+                        self.race_director.generate,
+                        f"{self.session.slug.replace('|', '_').replace(':', '')}-D",
                     )
                     self.race_director = None
             else:
@@ -442,27 +704,58 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
                 self.gap /= 1000.0
                 self.rival_distance = rival.lap_distance
             self.distance = data.lap_distance
+            self.frames.put(packet.header, "lap", (data.current_lap_time_in_ms,))
 
             # Alert if negative SC delta
             if data.safety_car_delta < 0.0 and time() > self.sc_slow_down_timestamp:
-                self.engineer(f"Delta {round(data.safety_car_delta, 1)} Slow down!")
+                self.engineer(
+                    f"Delta {round(data.safety_car_delta, 1)} Slow down!",
+                    URGENT,
+                    key="sc_delta",
+                    ttl=3.0,
+                )
                 self.sc_slow_down_timestamp = time() + 5.0
 
         except IndexError:
             return
 
         self.session.lap_data(data)
+        self.lap_invalid = bool(data.current_lap_invalid)
+
+        self.lap_delta.update(data.lap_distance, data.current_lap_time_in_ms / 1000.0)
+        if self.lap_delta.delta is not None and self.live_due("delta"):
+            self.push_live(
+                "delta",
+                {
+                    "delta": self.lap_delta.delta,
+                    "mini_sectors": list(self.lap_delta.mini_sectors),
+                },
+            )
+
+        if self.session.is_race():
+            self.intervals.update(packet)
+            if self.live_due("intervals"):
+                participants = self.get_last(PacketParticipantsData)
+                self.push_live(
+                    "intervals",
+                    self.intervals.live(
+                        [player_name(p) for p in participants.participants]
+                        if participants is not None
+                        else None
+                    ),
+                )
 
     def handle_MotionData(self, packet):
         try:
-            self.motion_data = packet.car_motion_data[_player_index(packet)].to_dict()
+            self.frames.put(
+                packet.header, "motion", MOTION.values(packet, _player_index(packet))
+            )
             if self.rival_index != 255:
-                self.rival_motion_data = {
-                    f"rival_{k}": v
-                    for k, v in packet.car_motion_data[self.rival_index]
-                    .to_dict()
-                    .items()
-                }
+                self.frames.put(
+                    packet.header,
+                    "rival_motion",
+                    MOTION.values(packet, self.rival_index),
+                )
         except IndexError:
             return
 
@@ -478,17 +771,14 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
                 del self.leader_distance[i:]
                 del self.leader_time[i:]
                 del self.leader_timestamp[i:]
+            self.intervals.truncate(flashback_time)
+            self.summary.truncate(flashback_time)
 
             # Remove events that are in the future w.r.t. the flashback time
-            while self.queue:
-                time, lap, _ = self.queue[-1]
-                if time <= flashback_time:
-                    self.session.lap = lap
-                    break
-                self.queue.pop()
-
-            self.last_fields.clear()
-            self.last_fields.update(self.queue[-1][2] if self.queue else {})
+            lap = self.window.truncate(flashback_time)
+            if lap is not None:
+                self.session.lap = lap
+            self.session.time = flashback_time
 
             # We can flush the rest as we won't be flashing back beyond this
             # point in time.
@@ -519,13 +809,5 @@ class TelemetryCollector(PacketHandler, SessionEventHandler):
     def get_last(self, packet_type):
         return self.last_packets.get(packet_type)
 
-    def engineer(self, message):
-        def _():
-            try:
-                engine = pyttsx3.init()
-                engine.say(message)
-                engine.runAndWait()
-            except:
-                pass
-
-        threading.Thread(target=_).start()
+    def engineer(self, message, priority=INFO, key=None, ttl=10.0):
+        self.race_engineer.say(message, priority, key, ttl)
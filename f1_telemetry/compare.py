@@ -0,0 +1,141 @@
+import os
+import typing as t
+
+import numpy as np
+
+from f1_telemetry.store import SUFFIX
+from f1_telemetry.store import TIME
+from f1_telemetry.store import laps
+from f1_telemetry.store import read_lap
+
+
+# The channels of a lap that are resampled on the distance grid
+CHANNELS = ("throttle", "brake", "speed", "gear", "steer")
+
+# The channels of discrete values, which hold the value of the last record
+# rather than being interpolated
+DISCRETE = {"gear"}
+
+# Bumped when the resampling changes, so that older caches are not used
+CACHE = "resampled-{step}.2.npz"
+
+
+def _mtime(path: str) -> float:
+    return max(
+        (e.stat().st_mtime for e in os.scandir(path) if e.name.endswith(SUFFIX)),
+        default=0.0,
+    )
+
+
+def _fill(values: np.ndarray) -> np.ndarray:
+    """Carry the last value forward over NaNs, e.g. for change-only laps."""
+    index = np.where(np.isfinite(values), np.arange(len(values)), 0)
+    np.maximum.accumulate(index, out=index)
+    return values[index]
+
+
+def _resample(path: str, step: float) -> t.Dict[str, np.ndarray]:
+    columns = read_lap(path)
+    try:
+        distance = _fill(np.asarray(columns["distance"]))
+    except KeyError:
+        raise ValueError(f"No lap distance data in {path}") from None
+
+    if "lap_time_ms" in columns:
+        time = _fill(np.asarray(columns["lap_time_ms"])) / 1000.0
+    else:
+        # Older laps have no lap time, so fall back to the record timestamps
+        time = np.asarray(columns[TIME]) / 1000.0
+        time -= time[np.isfinite(time)][0]
+
+    # Only keep the records that move the car forward along the lap, e.g. not
+    # the ones before crossing the line at the start of the session.
+    keep = np.isfinite(distance) & (distance >= 0.0)
+    forward = distance[keep]
+    if len(forward) < 2:
+        raise ValueError(f"Not enough lap distance data in {path}")
+    reached = np.maximum.accumulate(forward)
+    keep[keep] = np.concatenate(([True], forward[1:] > reached[:-1]))
+    distance = distance[keep]
+
+    grid = np.arange(0.0, distance[-1], step)
+    resampled = {"distance": grid}
+
+    for name in ("time",) + CHANNELS:
+        values = time if name == "time" else columns.get(name)
+        if values is None:
+            resampled[name] = np.full(len(grid), np.nan)
+            continue
+
+        values = _fill(np.asarray(values))[keep]
+        valid = np.isfinite(values)
+        if not valid.any():
+            resampled[name] = np.full(len(grid), np.nan)
+        elif name in DISCRETE:
+            points, values = distance[valid], values[valid]
+            index = np.searchsorted(points, grid, side="right") - 1
+            resampled[name] = values[np.maximum(index, 0)]
+        else:
+            resampled[name] = np.interp(grid, distance[valid], values[valid])
+
+    return resampled
+
+
+def resample(path: str, step: float = 1.0) -> t.Dict[str, np.ndarray]:
+    """Resample the channels of a stored lap on a lap distance grid.
+
+    The grid starts at the start line and has a point every ``step`` metres.
+    Resampled laps are cached in the lap directory, and the cache is only used
+    while it is newer than the lap data.
+    """
+    cache = os.path.join(path, CACHE.format(step=step))
+    try:
+        if os.stat(cache).st_mtime >= _mtime(path):
+            with np.load(cache) as data:
+                return dict(data)
+    except (OSError, ValueError):
+        pass
+
+    resampled = _resample(path, step)
+
+    try:
+        with open(cache + ".tmp", "wb") as f:
+            np.savez(f, **resampled)
+        os.replace(cache + ".tmp", cache)
+    except OSError:
+        # Best effort
+        pass
+
+    return resampled
+
+
+def expand(paths: t.Iterable[str]) -> t.List[str]:
+    """Expand session directories into their laps."""
+    result = []
+    for path in paths:
+        session_laps = laps(path)
+        result.extend(session_laps or [path])
+    return result
+
+
+def overlay(paths: t.List[str], step: float = 1.0) -> t.List[t.Dict[str, np.ndarray]]:
+    """Resample the given laps on a common lap distance grid.
+
+    Laps that are shorter than the longest one, like incomplete laps, are
+    padded with NaN. Every lap gets a ``delta`` channel with the cumulative
+    time delta, in seconds, with respect to the first lap.
+    """
+    resampled = [resample(path, step) for path in paths]
+
+    n = max(len(lap["distance"]) for lap in resampled)
+    grid = np.arange(n) * step
+    for lap in resampled:
+        for name, values in lap.items():
+            lap[name] = np.pad(values, (0, n - len(values)), constant_values=np.nan)
+        lap["distance"] = grid
+
+    reference = resampled[0]["time"]
+    for lap in resampled:
+        lap["delta"] = lap["time"] - reference
+
+    return resampled
@@ -0,0 +1,245 @@
+import typing as t
+from fnmatch import fnmatchcase
+
+from f1_telemetry.storage import Sink
+
+
+# Maximum reconstruction error of the fields, as (pattern, tolerance) pairs.
+# The first matching pattern wins, and fields with no tolerance are stored
+# exactly, i.e. every change is kept. The fields of the rival car, with the
+# ``rival_`` prefix, have the tolerance of the same field of the player car,
+# unless they match a pattern of their own.
+DEFAULT_TOLERANCES = [
+    ("speed", 1.0),
+    ("throttle", 0.02),
+    ("brake", 0.02),
+    ("steer", 0.02),
+    ("engine_rpm", 100.0),
+    ("rev_lights_percent", 5.0),
+    ("lap_time_ms", 10.0),
+    ("gap", 0.01),
+    ("distance", 0.5),
+    ("g_force_*", 0.05),
+    ("world_position_*", 0.5),
+    ("world_velocity_*", 0.5),
+    ("world_*_dir_*", 0.01),
+    ("pitch", 0.01),
+    ("roll", 0.01),
+    ("yaw", 0.01),
+    ("*_temperature*", 1.0),
+    ("tyres_pressure_*", 0.1),
+]
+
+RIVAL = "rival_"
+
+
+class DecimatingSink(Sink):
+    """Drop the records that can be reconstructed by linear interpolation.
+
+    This is a swinging door compression of the records of each lap, with the
+    lap distance as the independent variable, applied to all the fields at
+    once: a record is only written when some field of the next one cannot be
+    interpolated from the last written record within the tolerance of the
+    field. Steady-state segments, like straights, are thinned out, while
+    braking zones and corners keep their full resolution.
+
+    Records at the same distance as the last one, e.g. while the car is
+    stopped, are dropped if they are within tolerance of it, and are kept as a
+    step otherwise.
+    """
+
+    def __init__(
+        self,
+        sink: Sink,
+        tolerances: t.Optional[t.List[t.Tuple[str, float]]] = None,
+    ) -> None:
+        self.sink = sink
+        self.tolerances = DEFAULT_TOLERANCES if tolerances is None else tolerances
+        self._tolerance: t.Dict[str, float] = {}
+
+        self.label = None
+        self.anchor: t.Optional[t.Dict[str, t.Any]] = None
+        self.held: t.Optional[t.Dict[str, t.Any]] = None
+        self.held_at: t.Optional[int] = None  # The timestamp of the held record
+        # The range of slopes from the anchor that keeps every record since
+        # the anchor within tolerance, for each field.
+        self.lo: t.Dict[str, float] = {}
+        self.hi: t.Dict[str, float] = {}
+
+        self.received = 0
+        self.decimated = 0
+
+    def __enter__(self):
+        self.sink.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._flush()
+        return self.sink.__exit__(exc_type, exc_value, traceback)
+
+    @property
+    def connected(self):
+        return self.sink.connected
+
+    @property
+    def written(self):
+        return self.sink.written
+
+    @property
+    def dropped(self):
+        return self.sink.dropped
+
+    @property
+    def batches(self):
+        return self.sink.batches
+
+    @property
+    def queue_depth(self):
+        return getattr(self.sink, "queue_depth", 0)
+
+    def summary(self):
+        return (
+            self.sink.summary()
+            + f"\nDecimated {self.decimated} of {self.received} records"
+        )
+
+    def tolerance(self, field: str) -> float:
+        try:
+            return self._tolerance[field]
+        except KeyError:
+            tolerance = next(
+                (
+                    tol
+                    for pattern, tol in self.tolerances
+                    if fnmatchcase(field, pattern)
+                ),
+                None,
+            )
+            if tolerance is None:
+                tolerance = (
+                    self.tolerance(field[len(RIVAL) :])
+                    if field.startswith(RIVAL)
+                    else 0.0
+                )
+            self._tolerance[field] = tolerance
+            return tolerance
+
+    def new_session(self, slug, tags):
+        self.sink.new_session(slug, tags)
+
+    def location(self, label):
+        return self.sink.location(label)
+
+    def summarize(self, label, fields, timestamp=None):
+        self.sink.summarize(label, fields, timestamp)
+
+    def write(self, label, fields, timestamp=None):
+        self.received += 1
+
+        if label != self.label or self.anchor is None:
+            # Start over on a new lap
+            self._restart(label, fields, timestamp)
+            return
+
+        distance = fields.get("distance", 0.0)
+        if distance < self.held["distance"]:
+            # Start over after going back in distance
+            self._restart(label, fields, timestamp)
+            return
+
+        if distance == self.held["distance"]:
+            if self._same(fields):
+                self.decimated += 1
+            else:
+                # Keep the change as a step
+                self._restart(label, fields, timestamp)
+            return
+
+        if not self._fits(fields):
+            # Keep the last record that could be reached, and start from it
+            self.sink.write(label, self.held, self.held_at)
+            self.anchor = self.held
+            self.lo.clear()
+            self.hi.clear()
+        else:
+            self.decimated += self.held is not self.anchor
+
+        self._constrain(fields)
+        self.held, self.held_at = fields, timestamp
+
+    def close(self):
+        self._flush()
+        self.sink.close()
+
+    def _flush(self) -> None:
+        if self.held is not None and self.held is not self.anchor:
+            self.sink.write(self.label, self.held, self.held_at)
+        self.label = self.anchor = self.held = self.held_at = None
+
+    def _restart(self, label, fields, timestamp) -> None:
+        self._flush()
+
+        self.sink.write(label, fields, timestamp)
+        self.label = label
+        self.anchor = self.held = fields
+        self.held_at = timestamp
+        self.lo.clear()
+        self.hi.clear()
+
+    def _same(self, fields) -> bool:
+        held = self.held
+        tolerance = self.tolerance
+
+        for name, value in fields.items():
+            origin = held.get(name)
+            try:
+                if abs(value - origin) > tolerance(name):
+                    return False
+            except TypeError:
+                # Not a number, or a new field
+                if value != origin:
+                    return False
+
+        return True
+
+    def _fits(self, fields) -> bool:
+        anchor = self.anchor
+        dx = fields["distance"] - anchor["distance"]
+        lo, hi = self.lo, self.hi
+
+        for name, value in fields.items():
+            origin = anchor.get(name)
+            try:
+                slope = (value - origin) / dx
+            except TypeError:
+                # Not a number, or a new field
+                if value != origin:
+                    return False
+                continue
+
+            if name in lo and not lo[name] <= slope <= hi[name]:
+                return False
+
+        return True
+
+    def _constrain(self, fields) -> None:
+        anchor = self.anchor
+        dx = fields["distance"] - anchor["distance"]
+        lo, hi = self.lo, self.hi
+        tolerance = self.tolerance
+
+        for name, value in fields.items():
+            try:
+                delta = value - anchor[name]
+            except (TypeError, KeyError):
+                continue
+
+            tol = tolerance(name)
+            _lo, _hi = (delta - tol) / dx, (delta + tol) / dx
+            if name in lo:
+                if _lo > lo[name]:
+                    lo[name] = _lo
+                if _hi < hi[name]:
+                    hi[name] = _hi
+            else:
+                lo[name], hi[name] = _lo, _hi
@@ -0,0 +1,160 @@
+import typing as t
+from array import array
+
+from f1_telemetry.compare import resample
+from f1_telemetry.store import track as lap_track
+
+
+# Lap distance jumps longer than this, in metres, e.g. from a flashback to the
+# previous lap or lost packets, make the rest of the lap incomplete.
+MAX_JUMP = 50.0
+
+NAN = float("nan")
+
+
+class LapDelta:
+    """Live time delta to a reference lap.
+
+    Laps are recorded as the elapsed lap time, in seconds, at every point of a
+    lap distance grid with a point every ``step`` metres, and the delta is the
+    difference between the current lap time and the one of the reference lap
+    at the same lap distance. The grid points are filled in as the car passes
+    them, so every update takes constant time on average. Every
+    ``mini_sector`` metres, the time spent on the last mini-sector is compared
+    to the one of the reference lap too.
+
+    The reference lap is the given one, if any, until the driver sets a
+    faster complete lap, which then becomes the reference. The given lap is
+    only used in the sessions on its ``track``.
+    """
+
+    def __init__(
+        self,
+        reference: t.Optional[t.Sequence[float]] = None,
+        track: t.Optional[str] = None,
+        step: float = 1.0,
+        mini_sector: float = 200.0,
+    ) -> None:
+        self.step = step
+        self.points_per_mini_sector = max(1, round(mini_sector / step))
+
+        self.loaded = None if reference is None else array("d", reference)
+        self.track = track
+
+        self.clear(track)
+
+    def clear(self, track: t.Optional[str] = None) -> None:
+        """Start over, e.g. on a new session on the given track."""
+        self.reference = self.loaded if track == self.track else None
+        # The lap time of the reference lap, if known. Loaded laps end at the
+        # last grid point before the line.
+        self.reference_time: t.Optional[float] = None
+        self.clear_lap()
+
+    def clear_lap(self) -> None:
+        self.times = array("d")
+        self.start: t.Optional[int] = None  # The first grid point of the lap
+        self.distance = 0.0
+        self.time = 0.0
+        self.delta: t.Optional[float] = None
+        # The delta of every mini-sector of the lap, if known
+        self.mini_sectors: t.List[t.Optional[float]] = []
+
+    def update(self, distance: float, time: float) -> None:
+        """Update the lap with the lap distance, in metres, and the lap time, in
+        seconds, of the car."""
+        if distance < 0.0:
+            # Not on the lap yet, e.g. before crossing the line for the first
+            # time.
+            return
+
+        step, times = self.step, self.times
+        per_mini_sector = self.points_per_mini_sector
+        point = int(distance / step)
+
+        if self.start is not None and distance - self.distance > MAX_JUMP:
+            self.clear_lap()
+            times = self.times
+
+        if self.start is None:
+            if distance > MAX_JUMP:
+                # Joined the lap halfway through
+                self.start = point
+                times.extend([NAN] * point)
+                self.mini_sectors.extend([None] * (point // per_mini_sector))
+            else:
+                # The lap starts at the line
+                self.start = 0
+            times.append(NAN if self.start else 0.0)
+
+        if distance < self.distance:
+            # Flashback
+            del times[max(point + 1, self.start + 1) :]
+            del self.mini_sectors[(len(times) - 1) // per_mini_sector :]
+        else:
+            d0, t0 = self.distance, self.time
+            n = len(times)
+            if point >= n:
+                rate = (time - t0) / (distance - d0)
+                for p in range(n, point + 1):
+                    times.append(t0 + (p * step - d0) * rate)
+                    if not p % per_mini_sector:
+                        self.mini_sectors.append(self._mini_sector(p))
+
+        self.distance, self.time = distance, time
+        self.delta = self._delta(distance, time)
+
+    def finish(self, lap_time: float, best: bool) -> t.Optional[float]:
+        """End the current lap, with the given lap time, in seconds.
+
+        The lap becomes the reference if it is a personal best that is faster
+        than the reference lap, and it covers the whole lap. Returns the delta
+        of the lap time to the reference lap.
+        """
+        if self.reference_time is not None:
+            delta = lap_time - self.reference_time
+        else:
+            # The last live delta is the closest we have
+            delta = self.delta
+
+        faster = self.reference is None or (delta is not None and delta < 0.0)
+        if best and faster and self.start == 0:
+            # Close the lap at the finish line
+            self.times.append(lap_time)
+            self.reference = self.times
+            self.reference_time = lap_time
+
+        self.clear_lap()
+
+        return delta
+
+    def _delta(self, distance: float, time: float) -> t.Optional[float]:
+        reference = self.reference
+        if reference is None:
+            return None
+
+        x = distance / self.step
+        i = int(x)
+        if i + 1 >= len(reference):
+            # Extrapolate up to the line from the last grid points
+            i = len(reference) - 2
+            if i < 0 or (x - i) * self.step > MAX_JUMP:
+                return None
+
+        t0 = reference[i]
+        return time - (t0 + (x - i) * (reference[i + 1] - t0))
+
+    def _mini_sector(self, point: int) -> t.Optional[float]:
+        reference, times = self.reference, self.times
+        start = point - self.points_per_mini_sector
+        if reference is None or point >= len(reference):
+            return None
+
+        delta = (times[point] - times[start]) - (reference[point] - reference[start])
+        return None if delta != delta else delta
+
+
+def load_reference(path: str, step: float = 1.0) -> t.Tuple[array, str]:
+    """Load a reference lap from a lap directory of a columnar store, together
+    with its track."""
+    return array("d", resample(path, step)["time"].tolist()), lap_track(path)
@@ -0,0 +1,112 @@
+import heapq
+import itertools
+import threading
+import typing as t
+from time import monotonic
+
+import pyttsx3
+
+
+# Message priorities, lower is more urgent
+URGENT = 0
+WARNING = 1
+INFO = 2
+
+
+class _Message:
+    __slots__ = ("priority", "seq", "key", "text", "expires", "cancelled")
+
+    def __init__(self, priority, seq, key, text, expires) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.text = text
+        self.expires = expires
+        self.cancelled = False
+
+    def __lt__(self, other: "_Message") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RaceEngineer:
+    """Speak the race engineer messages from a single long-lived thread.
+
+    Messages are spoken in order of priority. A message with the same key as
+    one that is still waiting to be spoken replaces it, and messages that have
+    waited longer than their time to live are dropped, since they are likely
+    to be stale by the time they would be spoken.
+    """
+
+    def __init__(self) -> None:
+        self.queue: t.List[_Message] = []
+        self.pending: t.Dict[str, _Message] = {}
+        self.seq = itertools.count()
+        self.ready = threading.Condition()
+        self.thread: t.Optional[threading.Thread] = None
+
+        self.spoken = 0
+        self.coalesced = 0
+        self.expired = 0
+
+    def say(
+        self,
+        message: str,
+        priority: int = INFO,
+        key: t.Optional[str] = None,
+        ttl: float = 10.0,
+    ) -> None:
+        """Queue a message to be spoken, without blocking."""
+        key = key or message
+        with self.ready:
+            previous = self.pending.get(key)
+            if previous is not None:
+                previous.cancelled = True
+                priority = min(priority, previous.priority)
+                self.coalesced += 1
+
+            entry = self.pending[key] = _Message(
+                priority, next(self.seq), key, message, monotonic() + ttl
+            )
+            heapq.heappush(self.queue, entry)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+            self.ready.notify()
+
+    def _next(self) -> str:
+        with self.ready:
+            while True:
+                while not self.queue:
+                    self.ready.wait()
+
+                entry = heapq.heappop(self.queue)
+                if entry.cancelled:
+                    continue
+
+                del self.pending[entry.key]
+                if monotonic() > entry.expires:
+                    self.expired += 1
+                    continue
+
+                return entry.text
+
+    def _run(self) -> None:
+        try:
+            engine = pyttsx3.init()
+        except Exception as e:
+            print(f"WARNING: Text-to-speech not available: {e}")
+            engine = None
+
+        while True:
+            message = self._next()
+            if engine is None:
+                continue
+
+            try:
+                engine.say(message)
+                engine.runAndWait()
+                self.spoken += 1
+            except Exception:
+                pass
@@ -0,0 +1,90 @@
+import ctypes
+import struct
+import typing as t
+
+from f1.packets import TYRES
+from f1.packets import CarDamageData
+from f1.packets import CarMotionData
+from f1.packets import CarTelemetryData
+from f1.packets import PacketCarDamageData
+from f1.packets import PacketCarTelemetryData
+from f1.packets import PacketMotionData
+
+
+_FORMATS = {
+    ctypes.c_uint8: "B",
+    ctypes.c_int8: "b",
+    ctypes.c_uint16: "H",
+    ctypes.c_int16: "h",
+    ctypes.c_uint32: "I",
+    ctypes.c_int32: "i",
+    ctypes.c_uint64: "Q",
+    ctypes.c_int64: "q",
+    ctypes.c_float: "f",
+    ctypes.c_double: "d",
+}
+
+
+class CarDataExtractor:
+    """Read the data of a single car straight from the packet buffer.
+
+    The layout of the per-car structure is compiled into a single struct
+    format, so that the fields of a car can be unpacked in one pass, with the
+    per-tyre arrays expanded into ``<name>_<tyre>`` fields. Scalar float values
+    are rounded like ``Packet.to_dict`` does.
+    """
+
+    def __init__(self, packet_type: t.Type, field: str, car_type: t.Type) -> None:
+        self.offset = getattr(packet_type, field).offset
+        self.size = ctypes.sizeof(car_type)
+        self.count = getattr(packet_type, field).size // self.size
+
+        names = []
+        codes = []
+        self.floats = []
+        for name, ctype in car_type._fields_:
+            if issubclass(ctype, ctypes.Array):
+                codes.extend(_FORMATS[ctype._type_] * ctype._length_)
+                if ctype._length_ == len(TYRES):
+                    names.extend(f"{name}_{tyre.name.lower()}" for tyre in TYRES)
+                else:
+                    names.extend(f"{name}_{i}" for i in range(ctype._length_))
+            else:
+                if ctype in (ctypes.c_float, ctypes.c_double):
+                    self.floats.append(len(codes))
+                codes.append(_FORMATS[ctype])
+                names.append(name)
+
+        self.struct = struct.Struct("<" + "".join(codes))
+        assert self.struct.size == self.size, f"Unexpected {car_type} layout"
+
+        self._names = {"": tuple(names)}
+
+    def names(self, prefix: str = "") -> t.Tuple[str, ...]:
+        try:
+            return self._names[prefix]
+        except KeyError:
+            names = self._names[prefix] = tuple(prefix + _ for _ in self._names[""])
+            return names
+
+    def values(self, packet, index: int) -> t.List[t.Any]:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+
+        values = list(
+            self.struct.unpack_from(memoryview(packet), self.offset + index * self.size)
+        )
+        for i in self.floats:
+            values[i] = round(values[i], 3)
+
+        return values
+
+    def extract(self, packet, index: int, prefix: str = "") -> t.Dict[str, t.Any]:
+        return dict(zip(self.names(prefix), self.values(packet, index)))
+
+
+MOTION = CarDataExtractor(PacketMotionData, "car_motion_data", CarMotionData)
+TELEMETRY = CarDataExtractor(
+    PacketCarTelemetryData, "car_telemetry_data", CarTelemetryData
+)
+DAMAGE = CarDataExtractor(PacketCarDamageData, "car_damage_data", CarDamageData)
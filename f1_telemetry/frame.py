@@ -0,0 +1,83 @@
+import typing as t
+
+
+class FrameAssembler:
+    """Join the data of a game frame, coming from different packets, into one
+    record.
+
+    The parts of a frame are identified by the session UID and the overall
+    frame identifier in the packet headers. Their values are copied into a
+    preallocated record with a fixed layout, and the record is emitted when
+    the ``final`` part of the frame arrives, provided that all the ``required``
+    parts have arrived too. Optional parts that are missing are left out of
+    the record. Parts of an older frame than the current one are late and
+    dropped, and so are the frames that never complete.
+    """
+
+    def __init__(
+        self,
+        parts: t.Sequence[t.Tuple[str, t.Sequence[str]]],
+        required: t.Iterable[str],
+        final: str,
+    ) -> None:
+        self.names: t.List[str] = []
+        self.slices: t.Dict[str, slice] = {}
+        for part, names in parts:
+            start = len(self.names)
+            self.names.extend(names)
+            self.slices[part] = slice(start, len(self.names))
+
+        self.required = frozenset(required)
+        self.final = final
+
+        self.values: t.List[t.Any] = [None] * len(self.names)
+        self.present: t.Set[str] = set()
+        self.session_uid = None
+        self.frame = None
+
+        self.frames = 0
+        self.incomplete = 0
+        self.late = 0
+
+    def clear(self) -> None:
+        if self.present:
+            self.incomplete += 1
+        self.present.clear()
+        self.session_uid = self.frame = None
+
+    def put(self, header, part: str, values: t.Sequence[t.Any]):
+        """Add a part to the frame of the packet with the given header.
+
+        Returns the record of the frame when it is complete.
+        """
+        session_uid, frame = header.session_uid, header.overall_frame_identifier
+        if frame != self.frame or session_uid != self.session_uid:
+            if session_uid == self.session_uid and frame < self.frame:
+                self.late += 1
+                return None
+
+            self.clear()
+            self.session_uid, self.frame = session_uid, frame
+
+        self.values[self.slices[part]] = values
+        self.present.add(part)
+
+        if part != self.final:
+            return None
+
+        present = self.present
+        if not self.required <= present:
+            return None
+
+        self.frames += 1
+        if len(present) == len(self.slices):
+            record = dict(zip(self.names, self.values))
+        else:
+            names, values = self.names, self.values
+            record = {}
+            for part, _ in self.slices.items():
+                if part in present:
+                    record.update(zip(names[_], values[_]))
+        present.clear()
+
+        return record
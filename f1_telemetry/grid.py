@@ -0,0 +1,156 @@
+import ctypes
+import os
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from f1.packets import PacketCarTelemetryData
+from f1.packets import PacketLapData
+from f1.packets import PacketMotionData
+
+from f1_telemetry.store import _session_dir
+
+
+# The packets with data for every car on the grid, by the name of their chunks
+GRID_PACKETS = {
+    "motion": PacketMotionData,
+    "lap": PacketLapData,
+    "telemetry": PacketCarTelemetryData,
+}
+
+
+def dtype(ctype) -> np.dtype:
+    """The NumPy dtype with the same memory layout as a ctypes type."""
+    if issubclass(ctype, ctypes.Structure):
+        return np.dtype(
+            {
+                "names": [name for name, _ in ctype._fields_],
+                "formats": [dtype(field) for _, field in ctype._fields_],
+                "offsets": [getattr(ctype, name).offset for name, _ in ctype._fields_],
+                "itemsize": ctypes.sizeof(ctype),
+            }
+        )
+
+    if issubclass(ctype, ctypes.Array):
+        return np.dtype((dtype(ctype._type_), (ctype._length_,)))
+
+    return np.dtype(ctype)
+
+
+class _Chunk:
+    """Packets of one type, stored as the rows of a structured array."""
+
+    def __init__(self, name: str, packet_type: t.Type, size: int) -> None:
+        self.name = name
+        self.dtype = dtype(packet_type)
+        self.size = size
+        self.index = 0
+        self.new()
+
+    def new(self) -> None:
+        self.rows = np.empty(self.size, dtype=self.dtype)
+        self.bytes = memoryview(self.rows).cast("B")
+        self.count = 0
+
+    def put(self, packet) -> bool:
+        """Copy the packet into the next row. Returns whether the chunk is full."""
+        itemsize = self.dtype.itemsize
+        start = self.count * itemsize
+        self.bytes[start : start + itemsize] = memoryview(packet).cast("B")
+        self.count += 1
+        return self.count == self.size
+
+
+def _save(path: str, rows: np.ndarray) -> None:
+    try:
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, rows=rows)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"[ERROR] Cannot write grid data to {path}: {e}")
+
+
+class GridRecorder:
+    """Record the data of all the cars on the grid.
+
+    The motion, lap and telemetry packets are copied as they are into NumPy
+    structured arrays, one row per packet, with the layout of the packet
+    structures, so that e.g. ``rows["car_telemetry_data"]["speed"]`` is a
+    (frames, cars) array. Every session has its own directory under ``root``,
+    with the rows of each packet type saved in compressed chunks of
+    ``chunk_size`` packets, e.g. ``telemetry-00003.npz``. Chunks are saved in a
+    background thread to keep up with the packet rate.
+    """
+
+    def __init__(self, root: str, chunk_size: int = 1024) -> None:
+        self.root = root
+        self.chunk_size = chunk_size
+        self.path: t.Optional[str] = None
+        self.chunks = {
+            packet_type: _Chunk(name, packet_type, chunk_size)
+            for name, packet_type in GRID_PACKETS.items()
+        }
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        self.recorded = 0
+        self.saved = 0
+
+    def open(self, slug: str) -> None:
+        """Start recording a new session."""
+        self.flush()
+
+        self.path = os.path.join(self.root, _session_dir(slug))
+        os.makedirs(self.path, exist_ok=True)
+        # Carry on after the chunks of a session with the same name
+        names = [entry.name for entry in os.scandir(self.path)]
+        for chunk in self.chunks.values():
+            chunk.index = sum(_.startswith(chunk.name + "-") for _ in names)
+
+    def put(self, packet) -> None:
+        if self.path is None:
+            return
+
+        try:
+            chunk = self.chunks[type(packet)]
+        except KeyError:
+            return
+
+        self.recorded += 1
+        if chunk.put(packet):
+            self._save(chunk)
+
+    def flush(self) -> None:
+        for chunk in self.chunks.values():
+            if chunk.count:
+                self._save(chunk)
+
+    def close(self) -> None:
+        self.flush()
+        self.executor.shutdown()
+
+    def summary(self) -> str:
+        return f"Recorded {self.recorded} grid packets in {self.saved} chunks"
+
+    def _save(self, chunk: _Chunk) -> None:
+        path = os.path.join(self.path, f"{chunk.name}-{chunk.index:05}.npz")
+        self.executor.submit(_save, path, chunk.rows[: chunk.count])
+        chunk.index += 1
+        chunk.new()
+        self.saved += 1
+
+
+def load(session: str, name: str) -> np.ndarray:
+    """The rows of all the chunks of a packet type of a recorded session."""
+    paths = sorted(
+        entry.path
+        for entry in os.scandir(session)
+        if entry.name.startswith(name + "-") and entry.name.endswith(".npz")
+    )
+    if not paths:
+        return np.empty(0, dtype=dtype(GRID_PACKETS[name]))
+
+    rows = []
+    for path in paths:
+        with np.load(path) as data:
+            rows.append(data["rows"])
+    return np.concatenate(rows)
@@ -0,0 +1,196 @@
+import ctypes
+import typing as t
+
+import numpy as np
+from f1.packets import LapData
+from f1.packets import PacketHeader
+from f1.packets import PacketLapData
+
+
+# The fields of the lap data of the cars that the tower needs
+LAP_DATA = np.dtype(
+    {
+        "names": ["total_distance", "car_position", "current_lap_num", "result_status"],
+        "formats": [np.float32, np.uint8, np.uint8, np.uint8],
+        "offsets": [
+            LapData.total_distance.offset,
+            LapData.car_position.offset,
+            LapData.current_lap_num.offset,
+            LapData.result_status.offset,
+        ],
+        "itemsize": ctypes.sizeof(LapData),
+    }
+)
+
+HEADER_SIZE = ctypes.sizeof(PacketHeader)
+
+# The result status of the cars that are racing
+ACTIVE = 2
+
+NAN = float("nan")
+
+
+def _json(value: float) -> t.Optional[float]:
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+class IntervalTower:
+    """Live time gaps between all the cars in a race.
+
+    Every car has a ring buffer with the session time at which it reached each
+    point of a race distance grid, one every ``resolution`` metres. The gap of
+    a car to a car ahead is the time since the car ahead was at the same race
+    distance, interpolated between the grid points, and it is computed for all
+    the cars at once. The buffers only hold the last ``size`` grid points, i.e.
+    more than a lap of the longest track with the defaults, so memory is
+    bounded however long the race is.
+    """
+
+    def __init__(self, cars: int = 22, resolution: float = 10.0, size: int = 1024):
+        self.cars = cars
+        self.resolution = resolution
+        self.size = size
+
+        self.times = np.empty((cars, size))
+        self.points = np.empty((cars, size), dtype=np.int64)
+
+        self.clear()
+
+    def clear(self) -> None:
+        self.times.fill(np.nan)
+        self.points.fill(-1)
+
+        # The last grid point reached by every car, where and when the car was
+        # when it got there, and the race distance of the next grid point.
+        self.point = [-1] * self.cars
+        self.reached = [NAN] * self.cars
+        self.reached_at = [NAN] * self.cars
+        self.next = [0.0] * self.cars
+
+        self.lap_data = np.zeros(self.cars, LAP_DATA)
+        self.now = NAN
+
+    def update(self, packet: PacketLapData) -> None:
+        self.lap_data = lap_data = np.frombuffer(
+            packet, LAP_DATA, self.cars, HEADER_SIZE
+        )
+        self.now = now = packet.header.session_time
+
+        # This runs on every lap data packet, and cars only reach a new grid
+        # point every few packets, so plain Python beats NumPy calls on tiny
+        # arrays here.
+        distance = lap_data["total_distance"].tolist()
+        crossed = [car for car, d in enumerate(distance) if d >= self.next[car]]
+        if not crossed:
+            return
+
+        res, size = self.resolution, self.size
+        times, points = self.times, self.points
+        status = lap_data["result_status"].tolist()
+        for car in crossed:
+            if status[car] != ACTIVE:
+                continue
+
+            d = distance[car]
+            p = int(d // res)
+            d0, t0 = self.reached[car], self.reached_at[car]
+            if t0 != t0:
+                # No last position, so only the current grid point is known
+                times[car, p % size] = now
+                points[car, p % size] = p
+            else:
+                rate = (now - t0) / (d - d0)
+                for q in range(max(self.point[car] + 1, p - size + 1), p + 1):
+                    times[car, q % size] = t0 + (q * res - d0) * rate
+                    points[car, q % size] = q
+
+            self.point[car] = p
+            self.reached[car] = d
+            self.reached_at[car] = now
+            self.next[car] = (p + 1) * res
+
+    def truncate(self, time: float) -> None:
+        """Forget the grid points reached after the given time, e.g. on a
+        flashback."""
+        future = self.times > time
+        self.times[future] = np.nan
+        self.points[future] = -1
+
+        for car, p in enumerate(self.points.max(axis=1).tolist()):
+            self.point[car] = p
+            if p < 0:
+                self.reached[car] = self.reached_at[car] = NAN
+                self.next[car] = 0.0
+            else:
+                self.reached[car] = p * self.resolution
+                self.reached_at[car] = float(self.times[car, p % self.size])
+                self.next[car] = (p + 1) * self.resolution
+
+    def _active(self) -> np.ndarray:
+        return (self.lap_data["result_status"] == ACTIVE) & (
+            self.lap_data["total_distance"] >= 0.0
+        )
+
+    def time_at(self, cars: np.ndarray, distance: np.ndarray) -> np.ndarray:
+        """The session time at which the given cars were at the given race
+        distances, or NaN if it is no longer known."""
+        res, size = self.resolution, self.size
+
+        p = (distance // res).astype(np.int64)
+        start = p * res
+        slots, nexts = p % size, (p + 1) % size
+
+        t0 = np.where(self.points[cars, slots] == p, self.times[cars, slots], np.nan)
+        t1 = np.where(
+            self.points[cars, nexts] == p + 1, self.times[cars, nexts], np.nan
+        )
+        # The cars that have not reached the next grid point yet are between
+        # the two, at their current position.
+        current = np.isnan(t1)
+        d1 = np.where(current, self.lap_data["total_distance"][cars], start + res)
+        t1 = np.where(current, self.now, t1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(
+                d1 > start, t0 + (distance - start) * (t1 - t0) / (d1 - start), t0
+            )
+
+    def gaps(self) -> t.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The racing cars in race order, with their gaps to the leader and to
+        the car ahead, in seconds."""
+        position = self.lap_data["car_position"]
+        racing = np.flatnonzero(self._active() & (position > 0))
+        order = racing[np.argsort(position[racing])]
+
+        leader = np.full(len(order), np.nan)
+        interval = np.full(len(order), np.nan)
+        if len(order):
+            leader[0] = interval[0] = 0.0
+            behind = order[1:]
+            distance = self.lap_data["total_distance"][behind].astype(np.float64)
+            leader[1:] = self.now - self.time_at(
+                np.full(len(behind), order[0]), distance
+            )
+            interval[1:] = self.now - self.time_at(order[:-1], distance)
+
+        return order, leader, interval
+
+    def live(self, names: t.Optional[t.Sequence[str]] = None) -> t.List[dict]:
+        order, leader, interval = self.gaps()
+        position = self.lap_data["car_position"].tolist()
+        lap = self.lap_data["current_lap_num"].tolist()
+
+        tower = []
+        for i, car in enumerate(order):
+            tower.append(
+                {
+                    "car": int(car),
+                    "name": names[car] if names else str(car),
+                    "position": position[car],
+                    "lap": lap[car],
+                    "leader": _json(leader[i]),
+                    "ahead": _json(interval[i]),
+                    "behind": _json(interval[i + 1]) if i + 1 < len(order) else None,
+                }
+            )
+        return tower
@@ -0,0 +1,300 @@
+import asyncio
+import socket
+import struct
+import typing as t
+from collections import Counter
+
+from f1.listener import PacketListener
+from f1.packets import HEADER_FIELD_TO_PACKET_TYPE
+from f1.packets import resolve
+
+
+# packet_format, packet_version and packet_id from the packet header
+HEADER = struct.Struct("<H3xBB")
+# session_uid and overall_frame_identifier from the packet header
+FRAME = struct.Struct("<7xQ8xI")
+
+# The packet types that are sent at a fixed rate, for which gaps in the frame
+# identifiers are lost packets.
+REGULAR = {
+    "MotionData",
+    "SessionData",
+    "LapData",
+    "CarSetupData",
+    "CarTelemetryData",
+    "CarStatusData",
+    "CarDamageData",
+    "MotionExData",
+}
+
+
+def _set_rcvbuf(sock: socket.socket, size: t.Optional[int]) -> int:
+    if size:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+    actual = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    if size and actual < size:
+        print(
+            f"WARNING: Socket receive buffer is {actual} bytes "
+            f"instead of {size}. Check the system limits (e.g. net.core.rmem_max)"
+        )
+    return actual
+
+
+class TelemetryListener(PacketListener):
+    """Packet listener that exposes the raw datagrams.
+
+    If a capture writer is given, every datagram received is also appended to
+    the capture file. The socket receive buffer can be enlarged with
+    ``rcvbuf``, so that bursts of packets are not dropped by the kernel, and
+    up to ``batch`` datagrams that are already waiting are drained on every
+    wakeup.
+    """
+
+    def __init__(
+        self,
+        host: str = "",
+        port: int = 20777,
+        capture=None,
+        rcvbuf: t.Optional[int] = None,
+        batch: int = 64,
+    ) -> None:
+        super().__init__(host, port)
+        self.capture = capture
+        self.rcvbuf = _set_rcvbuf(self.socket, rcvbuf)
+        self.batch = batch
+
+        self.received = 0
+        self.wakeups = 0
+
+    def recv(self) -> bytes:
+        while True:
+            try:
+                data = self.socket.recv(2048)
+            except socket.timeout:
+                continue
+
+            if self.capture is not None:
+                self.capture.write(data)
+
+            return data
+
+    def get(self):
+        return resolve(self.recv())
+
+    def datagrams(self) -> t.Iterator[bytes]:
+        sock = self.socket
+        capture = self.capture
+        # Not available on Windows, where datagrams are read one at a time
+        dontwait = getattr(socket, "MSG_DONTWAIT", 0)
+
+        while True:
+            yield self.recv()
+            self.wakeups += 1
+            self.received += 1
+
+            if not dontwait:
+                continue
+
+            for _ in range(self.batch - 1):
+                try:
+                    data = sock.recv(2048, dontwait)
+                except (BlockingIOError, InterruptedError):
+                    break
+
+                if capture is not None:
+                    capture.write(data)
+
+                self.received += 1
+                yield data
+
+
+class _Stream:
+    __slots__ = ("last", "deltas", "stride", "received", "lost", "reordered")
+
+    def __init__(self) -> None:
+        self.last = None
+        self.deltas = Counter()
+        self.stride = None
+
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+
+
+class LossTracker:
+    """Track lost and reordered packets from their frame identifiers.
+
+    Each packet type is sent every ``stride`` frames, which depends on the
+    game frame rate and telemetry rate settings, so it is estimated as the
+    most common frame gap of the first ``learn`` packets of every session.
+    Larger gaps then count as lost packets, and packets with an older frame
+    identifier than the last one as reordered.
+    """
+
+    def __init__(self, learn: int = 32) -> None:
+        self.learn = learn
+        self.session_uid = None
+        self.streams: t.Dict[str, _Stream] = {}
+
+    def track(self, name: str, data) -> None:
+        try:
+            session_uid, frame = FRAME.unpack_from(data)
+        except struct.error:
+            return
+
+        if session_uid != self.session_uid:
+            # Frame identifiers start over with every session
+            self.session_uid = session_uid
+            for stream in self.streams.values():
+                stream.last = stream.stride = None
+                stream.deltas.clear()
+
+        try:
+            stream = self.streams[name]
+        except KeyError:
+            stream = self.streams[name] = _Stream()
+
+        stream.received += 1
+
+        last = stream.last
+        if last is None:
+            stream.last = frame
+            return
+
+        delta = frame - last
+        if delta <= 0:
+            if delta < 0:
+                stream.reordered += 1
+            return
+        stream.last = frame
+
+        stride = stream.stride
+        if stride is None:
+            stream.deltas[delta] += 1
+            if sum(stream.deltas.values()) >= self.learn:
+                stream.stride = stream.deltas.most_common(1)[0][0]
+            return
+
+        missing = round(delta / stride) - 1
+        if missing > 0:
+            stream.lost += missing
+
+    def loss_rate(self, name: str) -> float:
+        stream = self.streams.get(name)
+        if stream is None or not stream.lost:
+            return 0.0
+        return stream.lost / (stream.lost + stream.received)
+
+    def summary(self) -> t.Optional[str]:
+        streams = [
+            (name, stream)
+            for name, stream in sorted(self.streams.items())
+            if stream.lost or stream.reordered
+        ]
+        if not streams:
+            return None
+
+        return "Packet loss: " + ", ".join(
+            f"{name} {100 * self.loss_rate(name):.1f}% lost, "
+            f"{stream.reordered} reordered"
+            for name, stream in streams
+        )
+
+
+class TelemetryProtocol(asyncio.DatagramProtocol):
+    """Feed the datagrams received by the event loop to a collector."""
+
+    def __init__(self, collector, capture=None) -> None:
+        self.collector = collector
+        self.capture = capture
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if self.capture is not None:
+            self.capture.write(data)
+
+        self.collector.handle_datagram(data)
+
+
+async def listen(
+    collector,
+    host: str = "",
+    port: int = 20777,
+    capture=None,
+    rcvbuf: t.Optional[int] = None,
+):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: TelemetryProtocol(collector, capture), local_addr=(host, port)
+    )
+    _set_rcvbuf(transport.get_extra_info("socket"), rcvbuf)
+    return transport
+
+
+class PacketFilter:
+    """Decode only the packets of the given types.
+
+    The packet type is determined from the header of the datagram, and the
+    datagrams of any other type are skipped without being decoded.
+    """
+
+    def __init__(self, packet_types: t.Iterable[t.Type]) -> None:
+        packet_types = set(packet_types)
+        self.types = {
+            key: packet_type
+            for key, packet_type in HEADER_FIELD_TO_PACKET_TYPE.items()
+            if packet_type in packet_types
+        }
+        self.names = {
+            key: packet_type.__name__[6:]
+            for key, packet_type in HEADER_FIELD_TO_PACKET_TYPE.items()
+        }
+
+        self.regular = {key for key, name in self.names.items() if name in REGULAR}
+
+        self.decoded = Counter()
+        self.skipped = Counter()
+        self.skipped_bytes = 0
+        self.loss = LossTracker()
+
+    def decode(self, data):
+        try:
+            key = HEADER.unpack_from(data)
+        except struct.error:
+            self.skipped["Invalid"] += 1
+            return None
+
+        if key in self.regular:
+            self.loss.track(self.names[key], data)
+
+        packet_type = self.types.get(key)
+        if packet_type is None:
+            self.skipped[self.names.get(key, "Unknown")] += 1
+            self.skipped_bytes += len(data)
+            return None
+
+        self.decoded[self.names[key]] += 1
+
+        try:
+            return packet_type.unpack(data)
+        except ValueError:
+            # Truncated datagram
+            return None
+
+    def summary(self) -> str:
+        decoded = sum(self.decoded.values())
+        skipped = sum(self.skipped.values())
+        total = decoded + skipped
+        if not total:
+            return "No packets received"
+
+        summary = (
+            f"Decoded {decoded} packets, skipped {skipped} "
+            f"({100 * skipped / total:.0f}%, {self.skipped_bytes / 1e6:.1f} MB): "
+            + ", ".join(f"{name} {count}" for name, count in self.skipped.most_common())
+        )
+
+        loss = self.loss.summary()
+        if loss is not None:
+            summary += "\n" + loss
+
+        return summary
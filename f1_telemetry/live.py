@@ -1,56 +1,283 @@
 import asyncio
+import itertools
 import json
+import struct
+import threading
+import typing as t
+from collections import deque
 
 import websockets
 
+from f1_telemetry.metrics import Counter
+from f1_telemetry.metrics import Gauge
+
 
-LIVE_QUEUE = None
 loop = asyncio.get_event_loop()
-_CONNECTIONS = 0
+_loop_thread = None
+
+# Message types for which only the most recent message is worth sending
+CONFLATED = {
+    "trace",
+    "tyre_temp",
+    "car_status",
+    "fuel",
+    "weather_data",
+    "intervals",
+    "delta",
+}
+
+# Websocket subprotocols. Clients that do not request one get JSON messages.
+JSON_PROTOCOL = "f1-telemetry.json"
+BINARY_PROTOCOL = "f1-telemetry.binary"
+
+
+class Schema:
+    """The layout of a binary message.
+
+    Binary messages are made of the schema ID, as an unsigned short, followed
+    by the message data as packed little-endian floats, in the order described
+    by the schema. The schema is sent as a JSON message of type "schema" before
+    the first binary message that uses it.
+    """
+
+    def __init__(self, id: int, _type: str, shape: str, fields) -> None:
+        self.id = id
+        self.struct = struct.Struct(
+            f"<H{len(fields) if shape == 'object' else fields}f"
+        )
+        self.text = json.dumps(
+            {
+                "type": "schema",
+                "data": {
+                    "id": id,
+                    "type": _type,
+                    "shape": shape,
+                    "fields": list(fields) if shape == "object" else fields,
+                },
+            }
+        )
+
+
+class BinaryEncoder:
+    def __init__(self) -> None:
+        self.schemas: t.Dict[tuple, Schema] = {}
+
+    def encode(self, message: dict) -> t.Optional[t.Tuple[Schema, bytes]]:
+        """Encode a message with numeric data in the binary format."""
+        data = message["data"]
+        if isinstance(data, dict):
+            shape, fields, values = "object", tuple(data), data.values()
+        elif isinstance(data, (list, tuple)):
+            shape, fields, values = "array", len(data), data
+        else:
+            shape, fields, values = "scalar", 1, (data,)
+
+        key = (message["type"], shape, fields)
+        try:
+            schema = self.schemas[key]
+        except KeyError:
+            schema = self.schemas[key] = Schema(len(self.schemas), *key)
+
+        try:
+            return schema, schema.struct.pack(schema.id, *values)
+        except struct.error:
+            # Not numeric data
+            return None
+
+
+ENCODER = BinaryEncoder()
+
+
+class Frame:
+    """A live data message, encoded once for all the clients."""
+
+    __slots__ = ("type", "text", "binary")
+
+    def __init__(self, message: dict, binary: bool = False) -> None:
+        self.type = message["type"]
+        self.text = json.dumps(message)
+        self.binary = ENCODER.encode(message) if binary else None
+
+
+class Subscriber:
+    """The message queue of a single live data client.
+
+    Conflated message types only retain the most recent message, while any
+    other message is queued up to ``maxsize`` messages, after which the oldest
+    ones are dropped.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, maxsize: int = 256, binary: bool = False) -> None:
+        self.id = next(self._ids)
+        self.maxsize = maxsize
+        self.binary = binary
+        self.schemas: t.Set[int] = set()
+        self.queue: t.Deque[Frame] = deque()
+        self.latest: t.Dict[str, Frame] = {}
+        self.ready = asyncio.Event()
+
+        self.sent = 0
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self.queue) + len(self.latest)
+
+    def put(self, frame: Frame) -> None:
+        _type = frame.type
+        if _type in CONFLATED:
+            if self.latest.pop(_type, None) is not None:
+                self.dropped += 1
+            self.latest[_type] = frame
+        else:
+            if len(self.queue) >= self.maxsize:
+                self.queue.popleft()
+                self.dropped += 1
+            self.queue.append(frame)
+
+        self.ready.set()
+
+    async def get(self) -> Frame:
+        while True:
+            if self.queue:
+                return self.queue.popleft()
+            if self.latest:
+                return self.latest.pop(next(iter(self.latest)))
+
+            self.ready.clear()
+            await self.ready.wait()
+
+
+class Hub:
+    """Publish live data to every connected client."""
+
+    def __init__(self) -> None:
+        self.subscribers: t.Set[Subscriber] = set()
+        self.binary_subscribers = 0
+        # The last message of each type, encoded only once there are clients
+        self.state: t.Dict[str, t.Union[Frame, dict]] = {}
+
+    def publish(self, frame: Frame) -> None:
+        for subscriber in self.subscribers:
+            subscriber.put(frame)
+
+    def subscribe(self, binary: bool = False) -> Subscriber:
+        subscriber = Subscriber(binary=binary)
+        for frame in list(self.state.values()):
+            subscriber.put(frame if isinstance(frame, Frame) else Frame(frame))
+        self.subscribers.add(subscriber)
+        self.binary_subscribers += binary
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            self.binary_subscribers -= subscriber.binary
+
+    def stats(self) -> t.List[t.Tuple[int, int, int, int]]:
+        # Called from the metrics server thread, while the event loop can add
+        # or remove subscribers
+        return [(s.id, s.depth, s.sent, s.dropped) for s in list(self.subscribers)]
+
+
+HUB = Hub()
+
+LIVE_MESSAGES = Counter(
+    "f1_live_messages", "Live messages published to the clients", ("type",)
+)
+Gauge(
+    "f1_live_queue_messages",
+    "Messages waiting to be sent to a live client",
+    ("client",),
+    lambda: [((str(id),), depth) for id, depth, _, _ in HUB.stats()],
+)
+Gauge(
+    "f1_live_dropped_messages_total",
+    "Messages dropped for a live client that could not keep up",
+    ("client",),
+    lambda: [((str(id),), dropped) for id, _, _, dropped in HUB.stats()],
+    type="counter",
+)
+
+
+def has_subscribers():
+    return bool(HUB.subscribers)
+
+
+def clear_state():
+    HUB.state.clear()
 
 
 def enqueue(data):
-    global LIVE_QUEUE
+    if not HUB.subscribers:
+        # Keep the state for the clients that connect later
+        if data["type"] not in CONFLATED:
+            return False
+        HUB.state[data["type"]] = data
+        return True
 
-    if LIVE_QUEUE is None:
-        return False
+    # Encode the message here, while the data is still current, rather than
+    # once per client on the event loop.
+    frame = HUB.state[data["type"]] = Frame(data, HUB.binary_subscribers > 0)
+    LIVE_MESSAGES.labels(frame.type).inc()
 
-    loop.call_soon_threadsafe(LIVE_QUEUE.put_nowait, data)
+    if threading.get_ident() == _loop_thread:
+        HUB.publish(frame)
+    else:
+        loop.call_soon_threadsafe(HUB.publish, frame)
 
     return True
 
 
 async def consume_queue(websocket):
-    global LIVE_QUEUE, _CONNECTIONS
-
-    _CONNECTIONS += 1
-
-    if LIVE_QUEUE is None:
-        LIVE_QUEUE = asyncio.Queue()
+    subscriber = HUB.subscribe(binary=websocket.subprotocol == BINARY_PROTOCOL)
+    print(
+        f"Live client #{subscriber.id} connected"
+        + (" (binary)" if subscriber.binary else "")
+    )
 
     try:
         while True:
             try:
-                data = await asyncio.wait_for(LIVE_QUEUE.get(), 0.5)
+                frame = await asyncio.wait_for(subscriber.get(), 0.5)
             except asyncio.TimeoutError:
                 await websocket.ping()
                 continue
 
-            await websocket.send(json.dumps(data))
+            if subscriber.binary and frame.binary is not None:
+                schema, payload = frame.binary
+                if schema.id not in subscriber.schemas:
+                    await websocket.send(schema.text)
+                    subscriber.schemas.add(schema.id)
+                await websocket.send(payload)
+            else:
+                await websocket.send(frame.text)
+            subscriber.sent += 1
 
     except websockets.exceptions.ConnectionClosed:
-        _CONNECTIONS -= 1
-
-        if _CONNECTIONS == 0:
-            LIVE_QUEUE = None
-            print("Queue cleared")
         return
 
+    finally:
+        HUB.unsubscribe(subscriber)
+        print(
+            f"Live client #{subscriber.id} disconnected "
+            f"({subscriber.sent} messages sent, {subscriber.dropped} dropped)"
+        )
+
 
-async def _serve(host="localhost", port=20775):
-    async with websockets.serve(consume_queue, host, port):
+async def _serve(host="localhost", port=20775, setup=()):
+    async with websockets.serve(
+        consume_queue, host, port, subprotocols=[JSON_PROTOCOL, BINARY_PROTOCOL]
+    ):
+        for coroutine in setup:
+            await coroutine
         await asyncio.Future()  # run forever
 
 
-def serve(host="localhost", port=20775):
-    loop.run_until_complete(_serve(host, port))
+def serve(host="localhost", port=20775, setup=()):
+    global _loop_thread
+
+    _loop_thread = threading.get_ident()
+    loop.run_until_complete(_serve(host, port, setup))
@@ -0,0 +1,272 @@
+import typing as t
+from abc import ABC
+from abc import abstractmethod
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter_ns
+
+
+# Latency buckets, in seconds
+LATENCY_BUCKETS = (
+    5e-6,
+    1e-5,
+    2.5e-5,
+    5e-5,
+    1e-4,
+    2.5e-4,
+    5e-4,
+    1e-3,
+    2.5e-3,
+    5e-3,
+    1e-2,
+    2.5e-2,
+)
+
+SIZE_BUCKETS = (1, 10, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+Labels = t.Tuple[str, ...]
+Sample = t.Tuple[str, Labels, float]
+
+
+class Metric:
+    """A metric family, exposed in the Prometheus text format."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: t.Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+
+        REGISTRY.append(self)
+
+    def samples(self) -> t.Iterator[Sample]:
+        return iter(())
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(labels)} {_value(value)}")
+        return "\n".join(lines)
+
+
+def _labels(labels: t.Sequence[t.Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Family(Metric, ABC):
+    """A metric with a child for every combination of label values."""
+
+    def __init__(self, name: str, help: str, labels: t.Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.children: t.Dict[Labels, t.Any] = {}
+
+    def labels(self, *values: str):
+        try:
+            return self.children[values]
+        except KeyError:
+            child = self.children[values] = self._child()
+            return child
+
+    @abstractmethod
+    def _child(self):
+        pass
+
+    def samples(self) -> t.Iterator[Sample]:
+        for values, child in list(self.children.items()):
+            labels = tuple(zip(self.labelnames, values))
+            for suffix, extra, value in child.samples():
+                yield suffix, labels + extra, value
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, n: float = 1) -> None:
+        self.value += n
+
+    def samples(self) -> t.Iterator[Sample]:
+        yield "_total", (), self.value
+
+
+class Counter(_Family):
+    type = "counter"
+
+    def _child(self):
+        return _CounterChild()
+
+    def inc(self, n: float = 1) -> None:
+        self.labels().inc(n)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: t.Sequence[float]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self) -> t.Iterator[Sample]:
+        count = 0
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            count += n
+            yield "_bucket", (("le", _value(bound)),), count
+        yield "_sum", (), self.sum
+        yield "_count", (), count
+
+
+class Histogram(_Family):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: t.Sequence[str] = (),
+        buckets: t.Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+class Gauge(Metric):
+    """A metric whose value is read when it is exposed.
+
+    The callback returns either the value, or a list of (label values, value)
+    pairs.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: t.Sequence[str] = (),
+        callback: t.Optional[t.Callable[[], t.Any]] = None,
+        type: str = "gauge",
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.callback = callback
+        self.type = type
+
+    def samples(self) -> t.Iterator[Sample]:
+        if self.callback is None:
+            return
+
+        value = self.callback()
+        if not isinstance(value, (list, tuple)):
+            yield "", (), value
+            return
+
+        for values, _ in value:
+            yield "", tuple(zip(self.labelnames, values)), _
+
+
+REGISTRY: t.List[Metric] = []
+
+
+def expose() -> str:
+    """All the metrics in the Prometheus text format."""
+    return "\n".join(metric.expose() for metric in REGISTRY) + "\n"
+
+
+def timed(histogram: t.Union[Histogram, _HistogramChild]) -> t.Callable:
+    """Record the duration of the calls to the decorated function."""
+
+    def decorator(f: t.Callable) -> t.Callable:
+        @wraps(f)
+        def _(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                histogram.observe((perf_counter_ns() - start) / 1e9)
+
+        return _
+
+    return decorator
+
+
+HANDLER_LATENCY = Histogram(
+    "f1_handler_seconds", "Time spent handling a packet", ("handler",)
+)
+SESSION_STEP_LATENCY = Histogram(
+    "f1_session_step_seconds", "Time spent stepping the session state"
+)
+PUSH_LATENCY = Histogram(
+    "f1_push_seconds", "Time spent pushing a record to the flashback window"
+)
+FLUSH_LATENCY = Histogram(
+    "f1_flush_seconds", "Time spent flushing the flashback window"
+)
+SINK_WRITE_LATENCY = Histogram(
+    "f1_sink_write_seconds", "Time spent handing a record over to the sink"
+)
+SINK_BATCH_SIZE = Histogram(
+    "f1_sink_batch_records",
+    "Number of records per batch written to storage",
+    buckets=SIZE_BUCKETS,
+)
+
+FLASHBACK_DEPTH = Gauge(
+    "f1_flashback_window_records", "Records in the flashback window"
+)
+SINK_QUEUE_DEPTH = Gauge("f1_sink_queue_records", "Records waiting to be written")
+SINK_DROPPED = Gauge(
+    "f1_sink_dropped_records_total", "Records dropped by the sink", type="counter"
+)
+PACKETS_RECEIVED = Gauge(
+    "f1_packets_received_total", "Packets received", ("type",), type="counter"
+)
+PACKETS_SKIPPED = Gauge(
+    "f1_packets_skipped_total",
+    "Packets received but not decoded",
+    ("type",),
+    type="counter",
+)
+PACKETS_LOST = Gauge(
+    "f1_packets_lost_total",
+    "Packets lost, from the gaps in their frame identifiers",
+    ("type",),
+    type="counter",
+)
+PACKETS_REORDERED = Gauge(
+    "f1_packets_reordered_total",
+    "Packets received after a packet of a later frame",
+    ("type",),
+    type="counter",
+)
+PACKET_LOSS = Gauge("f1_packet_loss_ratio", "Fraction of packets lost", ("type",))
+FRAMES = Gauge(
+    "f1_frames_total",
+    "Player car frames by outcome: complete, incomplete or late",
+    ("outcome",),
+    type="counter",
+)
@@ -0,0 +1,76 @@
+import typing as t
+from datetime import datetime
+from datetime import timezone
+
+from f1_telemetry.storage import InfluxDBSink
+
+
+# The columns of the query results that are not fields
+_COLUMNS = {"result", "table"}
+
+
+def legacy_measurements(sink: InfluxDBSink) -> t.List[str]:
+    """The measurements of the old schema in the bucket of the sink.
+
+    The old schema has a measurement per lap, named after the session slug and
+    the lap number, e.g. ``2022-05-01|18:30|Monza|03``.
+    """
+    tables = sink.client.query_api().query(
+        f"""import "influxdata/influxdb/schema"
+        schema.measurements(bucket: "{sink.bucket}")"""
+    )
+    return [
+        record.get_value()
+        for table in tables
+        for record in table.records
+        if record.get_value().count("|") == 3
+    ]
+
+
+def _records(sink: InfluxDBSink, measurement: str):
+    query = f"""from(bucket: "{sink.bucket}")
+        |> range(start: 0)
+        |> filter(fn: (r) => r._measurement == "{measurement}")
+        |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
+        |> sort(columns: ["_time"])"""
+    for record in sink.client.query_api().query_stream(query):
+        fields = {
+            name: value
+            for name, value in record.values.items()
+            if value is not None and name not in _COLUMNS and not name.startswith("_")
+        }
+        yield fields, round(record.get_time().timestamp() * 1000)
+
+
+def convert(sink: InfluxDBSink, measurement: str, batch_size: int = 5000) -> int:
+    """Rewrite the records of a measurement of the old schema with the sink.
+
+    The records are read back in batches and written synchronously, so the
+    sink must not be running its writer thread. The records keep their
+    timestamps, and their sessions get the tags that can be told from the slug,
+    i.e. no session type. Returns the number of records written, or -1 if some
+    could not be written.
+    """
+    batch = []
+    count, dropped = 0, sink.dropped
+    for fields, timestamp in _records(sink, measurement):
+        batch.append((measurement, fields, timestamp, None))
+        if len(batch) >= batch_size:
+            sink._write_batch(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        sink._write_batch(batch)
+        count += len(batch)
+
+    return -1 if sink.dropped > dropped or not sink.healthy else count
+
+
+def delete(sink: InfluxDBSink, measurement: str) -> None:
+    """Delete a measurement of the old schema."""
+    sink.client.delete_api().delete(
+        datetime.fromtimestamp(0, timezone.utc),
+        datetime.now(timezone.utc),
+        f'_measurement="{measurement}"',
+        bucket=sink.bucket,
+    )
@@ -10,6 +10,9 @@ from f1.packets import LapData
 from f1.packets import PacketSessionData
 from f1.packets import SessionType
 
+from f1_telemetry.metrics import SESSION_STEP_LATENCY
+from f1_telemetry.metrics import timed
+
 
 class SessionState(Enum):
     INIT = 0
@@ -59,10 +62,12 @@ class Session:
         self.track = None
         self.type = None
         self.time = None  # seconds
+        self.epoch = 0  # milliseconds
         self.fuel = None
 
         self._lap_data = None
 
+    @timed(SESSION_STEP_LATENCY)
     def step(self):
         self.state = getattr(self, f"handle_{self.state.name}")()
 
@@ -187,9 +192,13 @@ class Session:
 
         self.__init__(self.handler)
 
+        self.time = packet.header.session_time
         self.session_uid = packet.header.session_uid
         self.track = TRACKS[packet.track_id]
-        self.slug = f'{datetime.now().strftime("%Y-%m-%d|%H:%M")}|{self.track}'
+        now = datetime.now()
+        self.slug = f'{now.strftime("%Y-%m-%d|%H:%M")}|{self.track}'
+        # The wall clock time of the start of the session, in milliseconds
+        self.epoch = round((now.timestamp() - packet.header.session_time) * 1000)
         self.type = packet.session_type
 
         self.handler.on_new_session(self)
@@ -213,6 +222,10 @@ class Session:
 
         self.step()
 
+    def timestamp(self, time: float) -> int:
+        """The wall clock time, in milliseconds, of the given session time."""
+        return self.epoch + round(time * 1000)
+
     def is_qualifying(self):
         if self.type is None:
             return False
@@ -1,12 +1,26 @@
 import http.server
 from pathlib import Path
 
+from f1_telemetry import metrics
+
 
 PORT = 20776
 
-Handler = lambda *args: http.server.SimpleHTTPRequestHandler(
-    *args, directory=str(Path(__file__).parent / "webapp")
-)
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    def __init__(self, *args):
+        super().__init__(*args, directory=str(Path(__file__).parent / "webapp"))
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            return super().do_GET()
+
+        body = metrics.expose().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
 
 def serve(org, token, host="localhost", port=PORT):
@@ -1,49 +1,441 @@
-from datetime import datetime
+import os
+import threading
+from abc import ABC
+from abc import abstractmethod
+from collections import deque
+from queue import Empty
+from queue import Full
+from queue import Queue
+from time import monotonic
+from time import time_ns
 
 from influxdb_client import InfluxDBClient
 from influxdb_client import Point
 from influxdb_client import WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
 
+from f1_telemetry.buffer import KEYFRAME
+from f1_telemetry.extract import DAMAGE
+from f1_telemetry.extract import MOTION
+from f1_telemetry.metrics import SINK_BATCH_SIZE
+
 
 class InfluxDBSinkError(Exception):
     pass
 
 
-class InfluxDBSink:
-    def __init__(self, org, token, bucket, url="http://localhost:8086"):
+_STOP = object()
+
+# The measurement of the fields of each kind of data. Any other field is
+# telemetry.
+MEASUREMENTS = {
+    **{name: "motion" for name in MOTION.names() + MOTION.names("rival_")},
+    **{name: "damage" for name in DAMAGE.names()},
+    **{
+        name: "lap"
+        for name in (
+            "lap_time_ms",
+            "sector_1_ms",
+            "sector_2_ms",
+            "sector_3_ms",
+            "total_time_ms",
+        )
+    },
+    "tyre_compound": "tyres",
+    "tyre_age": "tyres",
+}
+
+# The fields that go with every measurement of a record, to line them up
+SHARED_FIELDS = ("distance", KEYFRAME)
+
+
+def split(fields):
+    """Split the fields of a record by measurement."""
+    points = {}
+    shared = {}
+    for name, value in fields.items():
+        if name in SHARED_FIELDS:
+            shared[name] = value
+            continue
+
+        measurement = MEASUREMENTS.get(name, "telemetry")
+        try:
+            points[measurement][name] = value
+        except KeyError:
+            points[measurement] = {name: value}
+
+    if not points:
+        points["telemetry"] = {}
+    for values in points.values():
+        values.update(shared)
+
+    return points
+
+
+def session_tags(slug):
+    """The tags of a session that can be told from its slug."""
+    return {"session": slug, "track": slug.rpartition("|")[2]}
+
+
+class Sink(ABC):
+    """Destination of the telemetry records.
+
+    Records are written with a label of the form ``<session slug>|<lap>``,
+    a dictionary of fields and, optionally, the timestamp of the record in
+    milliseconds since the epoch. Records without a timestamp are stamped with
+    the time they are written at.
+    """
+
+    connected = True
+
+    written = 0
+    dropped = 0
+    batches = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def new_session(self, slug, tags):
+        """Describe the session with the given slug with the given tags."""
+        pass
+
+    @abstractmethod
+    def write(self, label, fields, timestamp=None):
+        pass
+
+    def location(self, label):
+        """Where the records with the given label are stored."""
+        return label
+
+    def summarize(self, label, fields, timestamp=None):
+        """Write aggregates of the lap with the given label.
+
+        Fields written by later calls for the same lap are added to, or
+        replace, the ones written before.
+        """
+        pass
+
+    def close(self):
+        pass
+
+    def summary(self):
+        return (
+            f"Stored {self.written} records in {self.batches} batches "
+            f"({self.dropped} dropped)"
+        )
+
+
+class InfluxDBSink(Sink):
+    """InfluxDB sink with a background batched writer.
+
+    Records are queued by ``write`` and sent to InfluxDB by a writer thread in
+    batches of line protocol, either when ``batch_size`` records have been
+    collected or ``flush_interval`` seconds have elapsed. The queue is bounded
+    and records are dropped (and counted) when it is full, so that callers
+    never block on network I/O, unless there is a spool to spill them to.
+
+    When InfluxDB is not reachable, the writer retries to connect with an
+    exponential backoff. If a ``spool`` file is given, the batches that cannot
+    be written are appended to it, and the spool is replayed in batches of
+    ``backfill_size`` points once InfluxDB is back, before any new batch is
+    written. Records that do not fit in the queue are spilled to the spool by
+    the writer as well. A spool left over by a previous run is replayed too.
+    Replaying a
+    point more than once is harmless, as InfluxDB overwrites points with the
+    same series and timestamp. The spool is counted in points rather than
+    records, as records are split into points.
+
+    Every kind of data in a record, e.g. telemetry, motion or damage, is
+    written as a point of its own measurement (see ``MEASUREMENTS``), tagged
+    with the session, the track, the lap and the session type. The summaries
+    of a lap are written to the ``summary`` measurement, all with the same
+    timestamp, so that they end up in a single point.
+    """
+
+    def __init__(
+        self,
+        org,
+        token,
+        bucket,
+        url="http://localhost:8086",
+        batch_size=1000,
+        flush_interval=1.0,
+        max_queue=100_000,
+        spool=None,
+        backfill_size=10_000,
+        max_backoff=60.0,
+    ):
         self.client = InfluxDBClient(url=url, token=token, org=org, debug=False)
+        self._write_api = self.client.write_api(write_options=SYNCHRONOUS)
+        self.bucket = bucket
         try:
             self.client.ready()
-            self._write_api = self.client.write_api(write_options=SYNCHRONOUS)
-            self.bucket = bucket
-        except:
-            self.client = None
+            self.healthy = True
+        except Exception:
+            self.healthy = False
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = Queue(maxsize=max_queue)
+        self._writer = None
+        self.tags = {}
+
+        self.backfill_size = backfill_size
+        self.max_backoff = max_backoff
+        self._backoff = 1.0
+        self._retry_at = monotonic() + self._backoff
+
+        self.spool = spool
+        try:
+            self._spool = open(spool, "ab") if spool is not None else None
+        except OSError as e:
+            raise InfluxDBSinkError(f"Cannot open the spool file: {e}") from e
+        self._spool_offset = 0
+        self._backfill_start = None
+        self._backfill_report = None
+        # Records that did not fit in the queue, to spill to the spool
+        self._overflow = deque()
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.spooled = 0
+        self.backfilled = 0
 
     def __enter__(self):
-        if self.client is not None:
-            self.client.__enter__()
+        self.client.__enter__()
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self.client is not None:
-            return self.client.__exit__(exc_type, exc_value, traceback)
+        self.close()
+        return self.client.__exit__(exc_type, exc_value, traceback)
 
     @property
     def connected(self):
-        return self.client is not None
+        return self.healthy
 
-    def write(self, label, fields):
-        if self.client is None:
+    @property
+    def queue_depth(self):
+        return self.queue.qsize() + len(self._overflow)
+
+    @property
+    def spool_bytes(self):
+        """The size of the spool that is still to be replayed."""
+        if self._spool is None:
+            return 0
+        return os.fstat(self._spool.fileno()).st_size - self._spool_offset
+
+    def location(self, label):
+        return f"influxdb:{self.bucket}/{label}"
+
+    def new_session(self, slug, tags):
+        self.tags[slug] = {**session_tags(slug), **tags}
+
+    def write(self, label, fields, timestamp=None):
+        if not self.healthy and self._spool is None:
+            self.dropped += 1
             return
 
-        p = Point(label)
+        if timestamp is None:
+            timestamp = time_ns() // 1_000_000
+        self._put((label, fields, timestamp, None))
 
-        p._fields.update(fields)
-        p.time(datetime.utcnow(), WritePrecision.MS)
+    def summarize(self, label, fields, timestamp=None):
+        if not self.healthy and self._spool is None:
+            self.dropped += 1
+            return
+
+        if timestamp is None:
+            timestamp = time_ns() // 1_000_000
+        self._put((label, fields, timestamp, "summary"))
 
+    def close(self):
+        if self._writer is None:
+            return
+
+        self.queue.put(_STOP)
+        self._writer.join()
+        self._writer = None
+
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+    def summary(self):
+        summary = super().summary()
+        if self.spool is not None:
+            summary += f"\nSpooled {self.spooled} points, backfilled {self.backfilled}"
+        return summary
+
+    def _put(self, item):
         try:
-            self._write_api.write(bucket=self.bucket, record=p)
+            self.queue.put_nowait(item)
+        except Full:
+            if self._spool is not None:
+                self._overflow.append(item)
+            else:
+                self.dropped += 1
+
+    def _send(self, lines) -> bool:
+        try:
+            self._write_api.write(
+                bucket=self.bucket,
+                record=b"\n".join(lines),
+                write_precision=WritePrecision.MS,
+            )
+            return True
         except Exception as e:
-            # Best effort
             print(f"[ERROR] Cannot write to InfluxDB: {e}")
+            self.healthy = False
+            self._retry_at = monotonic() + self._backoff
+            return False
+
+    def _lines(self, batch):
+        lines = []
+        for label, fields, timestamp, measurement in batch:
+            slug, _, lap = label.rpartition("|")
+            try:
+                tags = self.tags[slug]
+            except KeyError:
+                tags = self.tags[slug] = session_tags(slug)
+            points = split(fields) if measurement is None else {measurement: fields}
+            for measurement, values in points.items():
+                p = Point(measurement)
+                p._tags.update(tags)
+                p._tags["lap"] = lap
+                p._fields.update(values)
+                p.time(timestamp, WritePrecision.MS)
+                lines.append(p.to_line_protocol().encode())
+        return lines
+
+    def _write_batch(self, batch):
+        lines = self._lines(batch)
+
+        # Keep the records in order while there is a backlog
+        if self.healthy and not self.spool_bytes and self._send(lines):
+            self.written += len(batch)
+            self.batches += 1
+            SINK_BATCH_SIZE.observe(len(batch))
+        elif self._spool is not None:
+            self._write_spool(batch, lines)
+        else:
+            # Best effort
+            self.dropped += len(batch)
+
+    def _write_spool(self, batch, lines):
+        try:
+            self._spool.write(b"\n".join(lines) + b"\n")
+            self._spool.flush()
+            os.fsync(self._spool.fileno())
+            self.spooled += len(lines)
+        except OSError as e:
+            print(f"[ERROR] Cannot write to the spool: {e}")
+            self.dropped += len(batch)
+
+    def _spill(self):
+        batch = []
+        while self._overflow:
+            batch.append(self._overflow.popleft())
+        self._write_spool(batch, self._lines(batch))
+
+    def _reconnect(self):
+        if monotonic() < self._retry_at:
+            return
+
+        try:
+            self.client.ready()
+        except Exception:
+            self._backoff = min(2 * self._backoff, self.max_backoff)
+            self._retry_at = monotonic() + self._backoff
+            return
+
+        self.healthy = True
+        self._backoff = 1.0
+        print("Reconnected to InfluxDB")
+
+    def _backfill(self):
+        if self._backfill_start is None:
+            self._backfill_start = (monotonic(), self.backfilled)
+            self._backfill_report = monotonic()
+
+        lines = []
+        with open(self.spool, "rb") as spool:
+            spool.seek(self._spool_offset)
+            for line in spool:
+                lines.append(line.rstrip(b"\n"))
+                if len(lines) >= self.backfill_size:
+                    break
+            offset = spool.tell()
+
+        if lines and not self._send(lines):
+            return
+
+        self._spool_offset = offset
+        self.backfilled += len(lines)
+        self.batches += 1
+        SINK_BATCH_SIZE.observe(len(lines))
+
+        start, count = self._backfill_start
+        elapsed = monotonic() - start
+        rate = (self.backfilled - count) / elapsed if elapsed else 0.0
+
+        if not self.spool_bytes:
+            # Caught up
+            self._spool.truncate(0)
+            self._spool_offset = 0
+            self._backfill_start = None
+            print(
+                f"Backfilled {self.backfilled - count} points from the spool "
+                f"in {elapsed:.1f}s ({rate:.0f} points/s)"
+            )
+        elif monotonic() - self._backfill_report >= 5.0:
+            self._backfill_report = monotonic()
+            print(
+                f"Backfilling at {rate:.0f} points/s, "
+                f"{self.spool_bytes / 1e6:.1f} MB left in the spool"
+            )
+
+    def _run(self):
+        batch = []
+        deadline = monotonic() + self.flush_interval
+        stop = False
+
+        while not stop:
+            backlog = self.healthy and self.spool_bytes > 0
+            try:
+                item = self.queue.get(
+                    timeout=0.0 if backlog else max(0.0, deadline - monotonic())
+                )
+                while item is not _STOP:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self.queue.get_nowait()
+                stop = item is _STOP
+            except Empty:
+                pass
+
+            if batch and (
+                stop or len(batch) >= self.batch_size or monotonic() >= deadline
+            ):
+                self._write_batch(batch)
+                batch = []
+
+            if self._overflow:
+                self._spill()
+
+            if monotonic() >= deadline:
+                deadline = monotonic() + self.flush_interval
+
+            if stop:
+                break
+
+            if not self.healthy:
+                self._reconnect()
+            elif self.spool_bytes:
+                self._backfill()
@@ -0,0 +1,245 @@
+import json
+import mmap
+import os
+import typing as t
+from array import array
+from time import time_ns
+
+from f1_telemetry.metrics import SINK_BATCH_SIZE
+from f1_telemetry.storage import Sink
+
+
+# Column files hold native float64 values, one per record
+SUFFIX = ".f64"
+TIME = "_time"
+
+# The aggregates of a lap, as a JSON object
+SUMMARY = "summary.json"
+
+# The values of the columns of strings, as a JSON object of lists. Strings are
+# stored as their index in the list of their column.
+CATEGORIES = "categories.json"
+
+NAN = float("nan")
+
+
+def _session_dir(slug: str) -> str:
+    return slug.replace("|", "_").replace(":", "")
+
+
+class _Lap:
+    """The columns of a lap, buffered in memory until they are flushed.
+
+    Every column has a value for every record, with NaN for the fields that
+    a record does not have. Strings are stored as category codes, i.e. their
+    index in the categories of their column. Laps can be reopened, e.g. after
+    a flashback to the previous lap, in which case new records are appended
+    to the existing column files.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        self.flushed = 0
+        self.columns: t.Dict[str, array] = {}
+        for entry in os.scandir(path):
+            if entry.name.endswith(SUFFIX):
+                self.flushed = max(self.flushed, entry.stat().st_size // 8)
+                self.columns[entry.name[: -len(SUFFIX)]] = array("d")
+        self.rows = self.flushed
+
+        self.categories: t.Dict[str, t.Dict[str, int]] = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in read_categories(path).items()
+        }
+        self.new_categories = False
+
+    def append(self, timestamp: int, fields: t.Dict[str, t.Any]) -> None:
+        columns = self.columns
+
+        buffered = self.rows - self.flushed
+        for name in fields.keys() - columns.keys():
+            columns[name] = array("d", (NAN,) * buffered)
+        try:
+            times = columns[TIME]
+        except KeyError:
+            times = columns[TIME] = array("d", (NAN,) * buffered)
+
+        for name, column in columns.items():
+            try:
+                column.append(fields.get(name, NAN))
+            except TypeError:
+                # Not a number
+                column.append(self._code(name, fields[name]))
+        times[-1] = timestamp
+
+        self.rows += 1
+
+    def _code(self, name: str, value: t.Any) -> float:
+        if not isinstance(value, str):
+            return NAN
+
+        categories = self.categories.setdefault(name, {})
+        try:
+            return categories[value]
+        except KeyError:
+            self.new_categories = True
+            code = categories[value] = len(categories)
+            return code
+
+    def flush(self) -> None:
+        if self.rows == self.flushed:
+            return
+
+        if self.new_categories:
+            target = os.path.join(self.path, CATEGORIES)
+            with open(target + ".tmp", "w") as f:
+                json.dump({name: list(c) for name, c in self.categories.items()}, f)
+            os.replace(target + ".tmp", target)
+            self.new_categories = False
+
+        padding = array("d")
+        for name, column in self.columns.items():
+            with open(os.path.join(self.path, name + SUFFIX), "ab") as f:
+                # Columns created after the last flush have no values for the
+                # records already on disk.
+                missing = self.flushed - f.tell() // 8
+                if missing > 0:
+                    if len(padding) < missing:
+                        padding = array("d", (NAN,) * missing)
+                    f.write(memoryview(padding)[:missing])
+                column.tofile(f)
+            del column[:]
+
+        self.flushed = self.rows
+
+
+class ColumnarStore(Sink):
+    """Store the telemetry records in local column files.
+
+    Every session has its own directory under ``root``, with a subdirectory
+    for each lap. Each field of the records of a lap is stored in its own file
+    of float64 values, together with the ``_time`` column of the record
+    timestamps, in milliseconds. Columns are buffered in memory and appended to
+    their files in chunks of ``chunk_size`` records. The summary of a lap is
+    kept in its ``summary.json`` file.
+    """
+
+    def __init__(self, root: str, chunk_size: int = 1024) -> None:
+        self.root = root
+        self.chunk_size = chunk_size
+        self.laps: t.Dict[str, _Lap] = {}
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def write(self, label, fields, timestamp=None):
+        try:
+            lap = self.laps[label]
+        except KeyError:
+            # Records are written in lap order, so the previous laps are done
+            self.close()
+            slug, _, number = label.rpartition("|")
+            lap = self.laps[label] = _Lap(
+                os.path.join(self.root, _session_dir(slug), number)
+            )
+
+        lap.append(time_ns() // 1_000_000 if timestamp is None else timestamp, fields)
+        self.written += 1
+
+        if lap.rows - lap.flushed >= self.chunk_size:
+            self._flush(lap)
+
+    def location(self, label):
+        slug, _, number = label.rpartition("|")
+        return os.path.join(self.root, _session_dir(slug), number)
+
+    def summarize(self, label, fields, timestamp=None):
+        path = self.location(label)
+        target = os.path.join(path, SUMMARY)
+        try:
+            os.makedirs(path, exist_ok=True)
+            summary = {**read_summary(path), **fields}
+            with open(target + ".tmp", "w") as f:
+                json.dump(summary, f)
+            os.replace(target + ".tmp", target)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Cannot write the summary of {path}: {e}")
+
+    def close(self):
+        for lap in self.laps.values():
+            self._flush(lap)
+        self.laps.clear()
+
+    def _flush(self, lap: _Lap) -> None:
+        try:
+            SINK_BATCH_SIZE.observe(lap.rows - lap.flushed)
+            lap.flush()
+            self.batches += 1
+        except OSError as e:
+            self.dropped += lap.rows - lap.flushed
+            print(f"[ERROR] Cannot write to {lap.path}: {e}")
+            for column in lap.columns.values():
+                del column[:]
+            lap.rows = lap.flushed
+
+
+def sessions(root: str) -> t.List[str]:
+    """The session directories of a columnar store."""
+    return sorted(entry.path for entry in os.scandir(root) if entry.is_dir())
+
+
+def track(path: str) -> str:
+    """The track of a lap directory, from the name of its session directory."""
+    session = os.path.basename(os.path.dirname(os.path.normpath(path)))
+    return session.split("_", 2)[-1]
+
+
+def laps(session: str) -> t.List[str]:
+    """The lap directories of a session."""
+    return sorted(entry.path for entry in os.scandir(session) if entry.is_dir())
+
+
+def read_summary(path: str) -> t.Dict[str, t.Any]:
+    """The summary of a lap, if any."""
+    try:
+        with open(os.path.join(path, SUMMARY)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def read_categories(path: str) -> t.Dict[str, t.List[str]]:
+    """The strings of the columns of a lap, indexed by their codes."""
+    try:
+        with open(os.path.join(path, CATEGORIES)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def read_lap(path: str) -> t.Dict[str, memoryview]:
+    """Memory-map the columns of a lap.
+
+    Each column is returned as a memoryview of doubles, backed by the column
+    file, so that only the parts that are accessed are read from disk. The
+    strings of the columns of category codes are given by ``read_categories``.
+    """
+    columns = {}
+    for entry in os.scandir(path):
+        if not entry.name.endswith(SUFFIX):
+            continue
+
+        name = entry.name[: -len(SUFFIX)]
+        if not entry.stat().st_size:
+            columns[name] = memoryview(array("d"))
+            continue
+
+        with open(entry.path, "rb") as f:
+            columns[name] = memoryview(
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            ).cast("d")
+
+    return columns
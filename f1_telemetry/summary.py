@@ -0,0 +1,192 @@
+import typing as t
+from collections import deque
+
+
+NAN = float("nan")
+
+# Brake pedal positions above this count as braking
+BRAKING = 0.05
+
+# Gaps between samples longer than this, in seconds, e.g. from time spent in
+# the garage, are not counted.
+MAX_GAP = 1.0
+
+WHEELS = ("rl", "rr", "fl", "fr")
+WEAR = tuple(f"tyres_wear_{wheel}" for wheel in WHEELS)
+
+# The slots of the aggregates of a section
+(
+    START,
+    LAST,
+    SAMPLES,
+    DURATION,
+    MAX_SPEED,
+    THROTTLE,
+    BRAKE_TIME,
+    FUEL_FIRST,
+    FUEL_LAST,
+) = range(9)
+WEAR_FIRST = 9
+WEAR_LAST = WEAR_FIRST + len(WEAR)
+SLOTS = WEAR_LAST + len(WEAR)
+
+# The slots of the values at the start and at the end of a section
+FIRSTS = (FUEL_FIRST, *range(WEAR_FIRST, WEAR_LAST))
+LASTS = (FUEL_LAST, *range(WEAR_LAST, SLOTS))
+
+
+def _new(time: float, last: float = NAN) -> t.List[float]:
+    state = [NAN] * SLOTS
+    state[START] = time
+    state[LAST] = last
+    state[SAMPLES] = state[DURATION] = state[MAX_SPEED] = 0
+    state[THROTTLE] = state[BRAKE_TIME] = 0.0
+    return state
+
+
+def _merge(states: t.Sequence[t.Sequence[float]]) -> t.List[float]:
+    merged = list(states[0])
+    for state in states[1:]:
+        merged[LAST] = state[LAST]
+        merged[SAMPLES] += state[SAMPLES]
+        merged[DURATION] += state[DURATION]
+        merged[MAX_SPEED] = max(merged[MAX_SPEED], state[MAX_SPEED])
+        merged[THROTTLE] += state[THROTTLE]
+        merged[BRAKE_TIME] += state[BRAKE_TIME]
+        for first in FIRSTS:
+            if merged[first] != merged[first]:
+                merged[first] = state[first]
+        for last in LASTS:
+            if state[last] == state[last]:
+                merged[last] = state[last]
+    return merged
+
+
+def _fields(state: t.Sequence[float], prefix: str) -> t.Dict[str, t.Any]:
+    fields = {f"{prefix}samples": state[SAMPLES]}
+    if state[SAMPLES]:
+        fields[f"{prefix}max_speed"] = state[MAX_SPEED]
+        fields[f"{prefix}brake_time"] = round(state[BRAKE_TIME], 3)
+        if state[DURATION] > 0.0:
+            fields[f"{prefix}avg_throttle"] = round(
+                state[THROTTLE] / state[DURATION], 4
+            )
+
+    fuel_used = state[FUEL_FIRST] - state[FUEL_LAST]
+    if fuel_used == fuel_used:
+        fields[f"{prefix}fuel_used"] = round(fuel_used, 4)
+
+    for i, wheel in enumerate(WHEELS):
+        wear = state[WEAR_LAST + i] - state[WEAR_FIRST + i]
+        if wear == wear:
+            fields[f"{prefix}tyre_wear_{wheel}"] = round(wear, 4)
+
+    return fields
+
+
+class LapSummary:
+    """Running aggregates of the player car data over every lap and sector.
+
+    The records pushed to the collector are folded into the aggregates of the
+    current sector as they arrive: the top speed, the time-weighted average
+    throttle, the time spent braking, and the tyre wear and fuel used between
+    the start and the end of the sector. The aggregates of a lap are merged
+    from the ones of its sectors when they are needed.
+
+    To stay correct across flashbacks, the state after every update is kept
+    for ``window`` seconds, and ``truncate`` goes back to the last state
+    before the time of the flashback.
+    """
+
+    def __init__(self, window: float = 16.0) -> None:
+        self.window = window
+        self.clear()
+
+    def clear(self) -> None:
+        self.section: t.Optional[t.Tuple[int, int]] = None  # (lap, sector)
+        self.state = _new(NAN)
+        # The aggregates of the sectors of the current lap before this one
+        self.completed: t.Tuple[t.List[float], ...] = ()
+        self.snapshots: t.Deque[tuple] = deque()
+
+    def update(
+        self,
+        time: float,
+        lap: int,
+        sector: int,
+        fields: t.Dict[str, t.Any],
+        fuel: t.Optional[float] = None,
+    ) -> None:
+        if (lap, sector) != self.section:
+            self._start(time, lap, sector)
+
+        state = self.state
+
+        speed = fields.get("speed")
+        if speed is not None:
+            dt = time - state[LAST]
+            if not 0.0 <= dt <= MAX_GAP:
+                dt = 0.0
+            state[LAST] = time
+            state[SAMPLES] += 1
+            state[DURATION] += dt
+            if speed > state[MAX_SPEED]:
+                state[MAX_SPEED] = speed
+            state[THROTTLE] += fields["throttle"] * dt
+            if fields["brake"] > BRAKING:
+                state[BRAKE_TIME] += dt
+
+        if WEAR[0] in fields:
+            for i, name in enumerate(WEAR):
+                wear = fields[name]
+                if state[WEAR_FIRST + i] != state[WEAR_FIRST + i]:
+                    state[WEAR_FIRST + i] = wear
+                state[WEAR_LAST + i] = wear
+
+        if fuel is not None:
+            if state[FUEL_FIRST] != state[FUEL_FIRST]:
+                state[FUEL_FIRST] = fuel
+            state[FUEL_LAST] = fuel
+
+        snapshots = self.snapshots
+        snapshots.append((time, self.section, tuple(state), self.completed))
+        horizon = time - self.window
+        while snapshots[0][0] < horizon:
+            snapshots.popleft()
+
+    def truncate(self, time: float) -> None:
+        """Go back to the aggregates at the given time, e.g. on a flashback."""
+        snapshots = self.snapshots
+        while snapshots and snapshots[-1][0] > time:
+            snapshots.pop()
+
+        if not snapshots:
+            # Too far back, so start over from the next update
+            self.section = None
+            return
+
+        _, self.section, state, self.completed = snapshots[-1]
+        self.state = list(state)
+
+    def sector(self, lap: int, sector: int) -> t.Optional[t.Dict[str, t.Any]]:
+        """The aggregates of the given sector, as summary fields, if it is the
+        current one."""
+        if self.section != (lap, sector):
+            return None
+        return _fields(self.state, f"s{sector}_")
+
+    def lap(self, lap: int) -> t.Optional[t.Dict[str, t.Any]]:
+        """The aggregates of the given lap, as summary fields, if it is the
+        current one."""
+        if self.section is None or self.section[0] != lap:
+            return None
+        return _fields(_merge(self.completed + (self.state,)), "")
+
+    def _start(self, time: float, lap: int, sector: int) -> None:
+        last = self.state[LAST]
+        if self.section is not None and self.section[0] == lap:
+            self.completed += (self.state,)
+        else:
+            self.completed = ()
+        self.section = (lap, sector)
+        self.state = _new(time, last)
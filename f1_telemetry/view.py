@@ -1,3 +1,4 @@
+import typing as t
 from datetime import timedelta
 
 
@@ -35,16 +36,22 @@ class SessionPrinter:
                     self.last_sector += 1
 
     def print_sector(
-        self, n: int, lap: int, time: float, best_sector: bool, best_time: bool
+        self,
+        n: int,
+        lap: int,
+        time: float,
+        best_sector: bool,
+        best_time: bool,
+        delta: t.Optional[float] = None,
     ) -> None:
         if lap != self.last_lap or n != self.last_sector + 1:
             # Refresh lap
             self.print_lap(lap)
             self.last_sectors[n + 1 :] = [None] * (3 - n)
-            self.last_sectors[n] = (n, lap, time, best_sector, best_time)
+            self.last_sectors[n] = (n, lap, time, best_sector, best_time, delta)
             self._reprint_sectors(n, lap)
         else:
-            self.last_sectors[n] = (n, lap, time, best_sector, best_time)
+            self.last_sectors[n] = (n, lap, time, best_sector, best_time, delta)
 
         if best_sector:
             bg = "105"
@@ -58,6 +65,8 @@ class SessionPrinter:
             end=" ",
             flush=True,
         )
+        if delta is not None:
+            self.print_delta(delta)
 
         self.last_sector = n
 
@@ -76,6 +85,10 @@ class SessionPrinter:
 
         self.lap_ended = True
 
+    def print_delta(self, delta: float) -> None:
+        color = "32" if delta < 0 else "31"
+        print(f"\033[{color}m{delta:+.3f}\033[0m", end=" ", flush=True)
+
     def print_tyre(self, tyre: str, tyre_age: int, wear_rate: int) -> None:
         t = tyre[0]
         color = {"S": "31", "M": "33", "H": "37", "I": "32", "W": 34}[t]
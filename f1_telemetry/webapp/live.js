@@ -33,6 +33,12 @@ const fuelField = d3.select("#fuel").select("tspan");
 
 const gapField = d3.select("#gap");
 
+const intervals = d3.select("#intervals");
+
+const lapDelta = d3.select("#lap-delta");
+const deltaField = d3.select("#delta");
+const miniSectors = d3.select("#mini-sectors");
+
 // ---- Scales and colors ----
 
 const wearScale = d3.scaleLinear().domain([0, 100]).range([0.5, 1]);
@@ -140,6 +146,54 @@ function updateGap(data) {
     gapField.style("color", gapColor(data));
 }
 
+function deltaColor(value) {
+    if (value === null) {
+        return "gray";
+    }
+    return value < 0 ? "lime" : "gold";
+}
+
+function updateDelta(data) {
+    lapDelta.classed("hidden", false).classed("flex", true);
+
+    deltaField.text(`${data.delta >= 0 ? "+" : ""}${data.delta.toFixed(3)}`);
+    deltaField.style("color", data.delta < 0 ? "lime" : "red");
+
+    miniSectors.selectAll("div")
+        .data(data.mini_sectors)
+        .join("div")
+        .attr("class", "w-3 h-2 mx-px rounded-sm")
+        .style("background-color", deltaColor);
+}
+
+function formatGap(value) {
+    return value === null ? "" : `+${value.toFixed(3)}`;
+}
+
+function updateIntervals(data) {
+    intervals.classed("hidden", data.length === 0);
+
+    intervals.select("tbody")
+        .selectAll("tr")
+        .data(data, d => d.car)
+        .join(enter => {
+            const row = enter.append("tr");
+            for (let i = 0; i < 5; i++) {
+                row.append("td").attr("class", "px-2");
+            }
+            return row;
+        })
+        .order()
+        .each(function (d, i) {
+            const cells = d3.select(this).selectAll("td").nodes();
+            d3.select(cells[0]).attr("class", "px-2 text-center").text(d.position);
+            d3.select(cells[1]).text(d.name);
+            d3.select(cells[2]).attr("class", "px-2 text-center").text(d.lap);
+            d3.select(cells[3]).attr("class", "px-2 text-right").text(i ? formatGap(d.leader) : "Leader");
+            d3.select(cells[4]).attr("class", "px-2 text-right").text(i ? formatGap(d.ahead) : "");
+        });
+}
+
 function updateTrace(data) {
     pushTraceData(
         [data.distance, data.throttle, data.brake],
@@ -181,6 +235,14 @@ socket.onmessage = event => {
             updateGap(message.data.gap);
             break;
 
+        case "intervals":
+            updateIntervals(message.data);
+            break;
+
+        case "delta":
+            updateDelta(message.data);
+            break;
+
         default:
             console.log("Unknown message type:", message.type);
     }
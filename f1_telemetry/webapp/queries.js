@@ -8,14 +8,15 @@ function queryLapData(session, lap, queried) {
     const queryApi = influxDB.getQueryApi(org)
 
     let [date, t, location] = session.split("|")
-    let measurement = `${session}|${lap}`
 
     var values = {}, time = []
     var minTime = -1
     queryApi.queryRows(
         `from(bucket: "f1-telemetry")
         |> range(start: ${date}T00:00:00Z, stop: ${date}T23:59:59Z)
-        |> filter(fn: (r) => r["_measurement"] == "${measurement}")
+        |> filter(fn: (r) => r["session"] == "${session}" and r["lap"] == "${lap}")
+        |> filter(fn: (r) => r["_measurement"] != "summary")
+        |> filter(fn: (r) => r["_measurement"] == "telemetry" or (r["_field"] != "distance" and r["_field"] != "keyframe"))
         `, {
         next(row, tableMeta) {
             const obj = tableMeta.toObject(row)
@@ -64,13 +65,16 @@ function onSessionSelected(e, session) {
     d3.select(this).classed("highlighted", true);
 
     queryApi.queryRows(
-        `import "strings"
-        import "influxdata/influxdb/schema"
-        schema.measurements(bucket: "f1-telemetry")
-        |> filter(fn: (r) => strings.hasPrefix(prefix: "${session}", v: r._value))
+        `import "influxdata/influxdb/schema"
+        schema.tagValues(
+            bucket: "f1-telemetry",
+            tag: "lap",
+            predicate: (r) => r["session"] == "${session}",
+            start: 0,
+        )
         `, {
         next(row, tableMeta) {
-            data.push(tableMeta.toObject(row)._value.split("|")[3])
+            data.push(tableMeta.toObject(row)._value)
         },
         error(error) {
             log('QUERY FAILED', error)
@@ -115,45 +119,66 @@ export function getSessions() {
     let seenData = {}
     let data = []
 
+    function showSessions() {
+        var item = d3.select('#session_list')
+            .selectAll('li')
+            .data(data.sort().reverse())
+            ;
+
+        item.enter()
+            .append('li')
+            .attr('class', 'item')
+            .on("click", onSessionSelected)
+            .append("div")
+            .html(d => parseSessionId(d, seenData[d]));
+    }
+
+    // The number of laps of a session, from the tag index
+    function countLaps(session, counted) {
+        seenData[session] = 0;
+        queryApi.queryRows(
+            `import "influxdata/influxdb/schema"
+            schema.tagValues(
+                bucket: "f1-telemetry",
+                tag: "lap",
+                predicate: (r) => r["session"] == "${session}",
+                start: 0,
+            )
+            `, {
+            next(row, tableMeta) {
+                seenData[session]++;
+            },
+            error(error) {
+                log('QUERY FAILED', error)
+                counted()
+            },
+            complete() {
+                counted()
+            },
+        })
+    }
+
     queryApi.queryRows(
         `import "influxdata/influxdb/schema"
-        schema.measurements(bucket: "f1-telemetry")`, {
+        schema.tagValues(
+            bucket: "f1-telemetry",
+            tag: "session",
+            start: 0,
+        )
+        `, {
         next(row, tableMeta) {
-            if (tableMeta.toObject(row)._value != "live") {
-                const sessionId = tableMeta.toObject(row)._value;
-
-                let parts = sessionId.split("|");
-                if (parts.length != 4) {
-                    return;
-                }
-
-                let [date, time, location, lap] = parts;
-                let sessionPrefix = `${date}|${time}|${location}`;
-
-                if (seenData[sessionPrefix]) {
-                    seenData[sessionPrefix]++;
-                    return;
-                }
-
-                data.push(sessionPrefix);
-                seenData[sessionPrefix] = 1;
-            }
+            data.push(tableMeta.toObject(row)._value);
         },
         error(error) {
             log('QUERY FAILED', error)
         },
         complete() {
-            var item = d3.select('#session_list')
-                .selectAll('li')
-                .data(data.reverse())
-                ;
-
-            item.enter()
-                .append('li')
-                .attr('class', 'item')
-                .on("click", onSessionSelected)
-                .append("div")
-                .html(d => parseSessionId(d, seenData[d]));
+            let pending = data.length
+            data.forEach(session => countLaps(session, () => {
+                if (--pending == 0) {
+                    showSessions();
+                }
+            }));
         },
     })
 }